@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.people.models import LeaderboardEntry
+from apps.transcripts.models import Mission
+from apps.transcripts.signals import revision_committed
+
+
+CONTEXT_KEY = 'homepage-context'
+
+
+def homepage_context():
+    """
+    What the homepage shows everyone, from the cache if we can. Kept
+    for settings.HOMEPAGE_CACHE_SECONDS at most, and thrown away when a
+    page is cleaned or a mission changes.
+    """
+    context = cache.get(CONTEXT_KEY)
+    if context is None:
+        context = {
+            'leaderboard_overall': _leaderboard(LeaderboardEntry.OVERALL),
+            'leaderboard_recent': _leaderboard(LeaderboardEntry.RECENT),
+        }
+        try:
+            mission = Mission.objects.current()
+        except IndexError:
+            # no missions in the system!
+            pass
+        else:
+            context['mission'] = mission
+            context['pages'] = mission.pages.count()
+            context['pages_approved'] = mission.approved_pages().count()
+        cache.set(CONTEXT_KEY, context, settings.HOMEPAGE_CACHE_SECONDS)
+    return context
+
+
+def _leaderboard(board):
+    # Only what the homepage shows, rather than whole Users (with their
+    # email addresses and password hashes) in the cache.
+    return [
+        {
+            'name': user.name,
+            'pages': user.pages_cleaned + user.pages_approved,
+        }
+        for user in LeaderboardEntry.objects.top(board)
+    ]
+
+
+def invalidate_homepage():
+    cache.delete(CONTEXT_KEY)
+
+
+@receiver(revision_committed)
+def invalidate_homepage_on_revision(sender, revision, **kwargs):
+    invalidate_homepage()
+
+
+@receiver(post_save, sender=Mission)
+@receiver(post_delete, sender=Mission)
+def invalidate_homepage_on_mission(sender, instance, **kwargs):
+    invalidate_homepage()
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+# (Not apps.py, which would hide the top-level apps package from
+# implicit relative imports in this one.)
+class HomepageConfig(AppConfig):
+    name = 'apps.homepage'
+
+    def ready(self):
+        # connects the receivers that invalidate the homepage
+        from . import caching
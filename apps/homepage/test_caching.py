@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+from django_webtest import WebTest
+import os.path
+import pickle
+
+from apps.transcripts.factories import *
+from .caching import CONTEXT_KEY
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class HomepageCaching(WebTest):
+
+    def setUp(self):
+        cache.clear()
+        self.mission = MissionFactory(name=u"Mercury-Atlas 7")
+        PageFactory.create_batch(2, mission=self.mission)
+
+    def test_cached(self):
+        """Once cached, the homepage doesn't touch the database."""
+        self.app.get(reverse('homepage'))
+        with self.assertNumQueries(0):
+            resp = self.app.get(reverse('homepage'))
+        resp.mustcontain(u"Mercury-Atlas 7")
+
+    def test_revision(self):
+        """Cleaning a page updates the homepage."""
+        self.app.get(reverse('homepage'))
+
+        user = UserFactory(name=u"Alan Shepard")
+        page = self.mission.next_page_for_user(user)
+        page.create_revision(page.text, user)
+        resp = self.app.get(reverse('homepage'))
+        resp.mustcontain(
+            u"cleaned 1 out of 2 pages",
+            u"Alan Shepard: 1 cleaned.",
+        )
+
+    def test_no_users(self):
+        """Only names and counts are cached, not whole users."""
+        user = UserFactory(name=u"Alan Shepard")
+        page = self.mission.next_page_for_user(user)
+        page.create_revision(page.text, user)
+        self.app.get(reverse('homepage'))
+
+        cached = cache.get(CONTEXT_KEY)
+        self.assertEqual(
+            [ { 'name': u"Alan Shepard", 'pages': 1 } ],
+            cached['leaderboard_overall'],
+        )
+        self.assertNotIn(user.email, pickle.dumps(cached))
+
+    def test_mission(self):
+        """Changing the mission updates the homepage."""
+        self.app.get(reverse('homepage'))
+
+        self.mission.name = u"Friendship 7"
+        self.mission.save()
+        resp = self.app.get(reverse('homepage'))
+        resp.mustcontain(u"Friendship 7")
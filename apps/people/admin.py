@@ -89,7 +89,7 @@ class CustomUserAdmin(UserAdmin):
     add_form = UserCreationForm
 
     fieldsets = (
-        (None, {'fields': (('email', 'password', 'name',), ('pages_cleaned', 'pages_approved', 'score'))}),
+        (None, {'fields': (('email', 'password', 'name',), ('pages_cleaned', 'pages_approved', 'current_score'))}),
         (_('Permissions'), {'fields': ('is_active', 'is_staff', 'is_superuser',
                                        'groups', 'user_permissions')}),
         (_('Important dates'), {'fields': ('last_login', 'date_joined')}),
@@ -106,6 +106,7 @@ class CustomUserAdmin(UserAdmin):
         'date_joined',
         'pages_cleaned',
         'pages_approved',
+        'current_score',
     )
 
     list_display = (
@@ -114,7 +115,7 @@ class CustomUserAdmin(UserAdmin):
         'email',
         'pages_cleaned',
         'pages_approved',
-        'score',
+        'current_score',
         'is_staff',
         'date_joined',
     )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.people.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = """Work out the leaderboards again from everyone's page counts and
+scores.
+
+They're kept up to date as pages are cleaned, so this is only needed if
+counts or scores have been changed some other way (eg in the admin), or
+people on a leaderboard have been deleted. (benchmark_cleaning does this
+itself once it has deleted its users.)"""
+
+    def handle(self, *args, **options):
+        LeaderboardEntry.objects.rebuild()
+        self.stdout.write(
+            u"Rebuilt leaderboards (%i entries)." % (
+                LeaderboardEntry.objects.count(),
+            )
+        )
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import datetime, timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# As they were when this migration was written; see apps.people.models.
+SCORE_HALF_LIFE = timedelta(days=14)
+SCORE_EPOCH = datetime(2016, 1, 1, tzinfo=timezone.utc)
+
+
+def _weight():
+    return 2 ** (
+        (timezone.now() - SCORE_EPOCH).total_seconds() /
+        SCORE_HALF_LIFE.total_seconds()
+    )
+
+
+def scale_scores(apps, schema_editor):
+    # Scores were current (decayed by cron), so scale them to SCORE_EPOCH.
+    User = apps.get_model('people', 'User')
+    User.objects.update(score=models.F('score') * _weight())
+
+
+def unscale_scores(apps, schema_editor):
+    User = apps.get_model('people', 'User')
+    User.objects.update(score=models.F('score') / _weight())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0006_auto_20160815_0953'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='score',
+            field=models.FloatField(default=0, help_text='Score as of SCORE_EPOCH (see score_weight()); use current_score.', db_index=True),
+        ),
+        migrations.RunPython(scale_scores, unscale_scores),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+LEADERBOARD_SIZE = 10
+
+
+def fill_leaderboards(apps, schema_editor):
+    User = apps.get_model('people', 'User')
+    LeaderboardEntry = apps.get_model('people', 'LeaderboardEntry')
+
+    contributors = User.objects.filter(
+        models.Q(pages_cleaned__gt=0) | models.Q(pages_approved__gt=0),
+    )
+    for board, users in (
+        (
+            'overall',
+            contributors.annotate(
+                value=models.F('pages_cleaned') + models.F('pages_approved'),
+            ).order_by('-value', 'pk'),
+        ),
+        (
+            'recent',
+            contributors.annotate(
+                value=models.F('score'),
+            ).order_by('-value', 'pk'),
+        ),
+    ):
+        LeaderboardEntry.objects.bulk_create(
+            LeaderboardEntry(board=board, user_id=pk, value=value)
+            for pk, value in users.values_list(
+                'pk', 'value',
+            )[:LEADERBOARD_SIZE]
+        )
+
+
+def empty_leaderboards(apps, schema_editor):
+    LeaderboardEntry = apps.get_model('people', 'LeaderboardEntry')
+    LeaderboardEntry.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0008_leaderboardentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_leaderboards, empty_leaderboards),
+    ]
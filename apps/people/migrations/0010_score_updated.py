@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import datetime, timedelta
+from django.db import migrations, models
+from django.utils import timezone
+import django.utils.timezone
+import math
+
+
+# As they were when this migration was written; see apps.people.models.
+SCORE_HALF_LIFE = timedelta(days=14)
+SCORE_EPOCH = datetime(2016, 1, 1, tzinfo=timezone.utc)
+
+
+def _half_lives(when):
+    return (
+        (when - SCORE_EPOCH).total_seconds() /
+        SCORE_HALF_LIFE.total_seconds()
+    )
+
+
+def rebase_scores(apps, schema_editor):
+    # Scores were as of SCORE_EPOCH; make them as of now. Recent
+    # leaderboard values become log2 of what they were (see score_rank()).
+    User = apps.get_model('people', 'User')
+    LeaderboardEntry = apps.get_model('people', 'LeaderboardEntry')
+    now = timezone.now()
+    User.objects.update(
+        score=models.F('score') / 2 ** _half_lives(now),
+        score_updated=now,
+    )
+    for entry in LeaderboardEntry.objects.filter(board='recent'):
+        entry.value = math.log(entry.value, 2) if entry.value > 0 else 0.0
+        entry.save()
+
+
+def unbase_scores(apps, schema_editor):
+    User = apps.get_model('people', 'User')
+    LeaderboardEntry = apps.get_model('people', 'LeaderboardEntry')
+    for user in User.objects.exclude(score=0):
+        user.score *= 2 ** _half_lives(user.score_updated)
+        user.save()
+    for entry in LeaderboardEntry.objects.filter(board='recent'):
+        entry.value = 2 ** entry.value
+        entry.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0009_fill_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='score_updated',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='score',
+            field=models.FloatField(default=0, help_text='Score as of score_updated; use current_score.'),
+        ),
+        migrations.RunPython(rebase_scores, unbase_scores),
+    ]
@@ -1,7 +1,90 @@
+from datetime import datetime, timedelta
 from django.contrib.auth import models as user_models
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Case, F, Func, Q, Value, When
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
+import math
+
+
+# Scores halve every SCORE_HALF_LIFE. Rather than decaying everyone's
+# score regularly, each person's score is stored as of when it last
+# changed (score_updated), and decayed from then when it's read
+# (current_score), added to, or sorted on (DecayedScore).
+SCORE_HALF_LIFE = timedelta(days=14)
+# Where recent leaderboard values are measured from; see score_rank().
+SCORE_EPOCH = datetime(2016, 1, 1, tzinfo=timezone.utc)
+
+# How many people each leaderboard shows.
+LEADERBOARD_SIZE = 10
+
+
+def score_decay(since, now=None):
+    """Returns what a score from since is worth at now (default now)."""
+    if now is None:
+        now = timezone.now()
+    return 0.5 ** (
+        (now - since).total_seconds() / SCORE_HALF_LIFE.total_seconds()
+    )
+
+
+def score_rank(score, score_updated):
+    """
+    Returns a value that orders people by current score, whenever their
+    scores were last updated: log2 of the score as of SCORE_EPOCH. It
+    goes up by 26 a year, so unlike the score as of SCORE_EPOCH it never
+    overflows.
+    """
+    if score <= 0:
+        return 0.0
+    return math.log(score, 2) + (
+        (score_updated - SCORE_EPOCH).total_seconds() /
+        SCORE_HALF_LIFE.total_seconds()
+    )
+
+
+class DecayedScore(Func):
+    """
+    People's current score, in SQL, to update or order by. (SQLite has
+    no POWER(), so it's added to each connection below.)
+    """
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        super(DecayedScore, self).__init__(
+            F('score'),
+            F('score_updated'),
+            output_field=models.FloatField(),
+        )
+
+    def as_sql(self, compiler, connection):
+        score, score_params = compiler.compile(self.source_expressions[0])
+        updated, updated_params = compiler.compile(
+            self.source_expressions[1],
+        )
+        if connection.vendor == 'postgresql':
+            age = "EXTRACT(EPOCH FROM (%%s - %s))" % updated
+            least = "LEAST"
+        else:
+            age = "((julianday(%%s) - julianday(%s)) * 86400.0)" % updated
+            least = "MIN"
+        # (anything over 1000 half-lives old is near enough nothing, and
+        # some databases complain if it underflows)
+        sql = "%s * POWER(0.5, %s(%s / %%s, 1000.0))" % (score, least, age)
+        return sql, (
+            score_params +
+            [ connection.ops.value_to_db_datetime(self.now) ] +
+            updated_params +
+            [ SCORE_HALF_LIFE.total_seconds() ]
+        )
+
+
+@receiver(connection_created)
+def add_sqlite_power(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function('POWER', 2, math.pow)
 
 
 class UserManager(user_models.BaseUserManager):
@@ -63,8 +146,9 @@ class User(user_models.AbstractBaseUser, user_models.PermissionsMixin):
     )
     score = models.FloatField(
         default=0,
-        help_text=_('Current score; decays over time (see decay_scores command).'),
+        help_text=_('Score as of score_updated; use current_score.'),
     )
+    score_updated = models.DateTimeField(default=timezone.now)
 
     objects = UserManager()
     USERNAME_FIELD = 'email'
@@ -75,3 +159,158 @@ class User(user_models.AbstractBaseUser, user_models.PermissionsMixin):
 
     def get_short_name(self):
         return self.name
+
+    @property
+    def current_score(self):
+        """Score now, with each contribution halved every half-life."""
+        return self.score * score_decay(self.score_updated)
+
+
+class LeaderboardEntryManager(models.Manager):
+
+    def top(self, board):
+        """The people on a leaderboard, best first."""
+        return [
+            entry.user
+            for entry in self.filter(
+                board=board,
+            ).select_related(
+                'user',
+            ).order_by(
+                '-value', 'user_id',
+            )[:LEADERBOARD_SIZE]
+        ]
+
+    def record(self, user_pk):
+        """
+        Update the leaderboards after someone's counts or score have
+        gone up (call it in the same transaction, which then holds a
+        lock on the leaderboards until it ends). Since they only ever go
+        up, nobody else can move onto a leaderboard, so each one stays
+        exactly the top LEADERBOARD_SIZE.
+        """
+        values = LeaderboardEntry.values(
+            *User.objects.filter(
+                pk=user_pk,
+            ).values_list(
+                'pages_cleaned', 'pages_approved', 'score', 'score_updated',
+            ).get()
+        )
+        self._lock()
+        # both leaderboards are small, so read them whole
+        boards = dict((board, []) for board in values)
+        for entry in self.order_by('-value', 'user_id'):
+            boards[entry.board].append(entry)
+
+        on_boards = []
+        for board, value in values.items():
+            entries = boards[board]
+            if user_pk in [ entry.user_id for entry in entries ]:
+                on_boards.append(When(board=board, then=Value(value)))
+            elif len(entries) < LEADERBOARD_SIZE:
+                self.create(board=board, user_id=user_pk, value=value)
+            elif value > entries[LEADERBOARD_SIZE - 1].value:
+                self.create(board=board, user_id=user_pk, value=value)
+                # and push whoever was last off the bottom
+                self.filter(
+                    pk__in=[
+                        entry.pk for entry in entries[LEADERBOARD_SIZE - 1:]
+                    ],
+                ).delete()
+        if on_boards:
+            self.filter(
+                user_id=user_pk,
+            ).update(
+                value=Case(*on_boards, default=F('value')),
+            )
+
+    def _lock(self):
+        # People saving at the same time take turns with the
+        # leaderboards, or two of them could both add the same person,
+        # or both take the last place. Locking the rows wouldn't do, as
+        # there are none to lock while a leaderboard is filling up, so
+        # lock the table against other writers (readers carry on). Other
+        # databases (SQLite) only have one writer at a time anyway.
+        connection = connections[router.db_for_write(LeaderboardEntry)]
+        if connection.vendor == 'postgresql':
+            connection.cursor().execute(
+                "LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE" % (
+                    connection.ops.quote_name(
+                        LeaderboardEntry._meta.db_table,
+                    ),
+                )
+            )
+
+    def rebuild(self):
+        """Work out the leaderboards again from everyone's counts."""
+        contributors = User.objects.filter(
+            Q(pages_cleaned__gt=0) | Q(pages_approved__gt=0),
+        )
+        with transaction.atomic():
+            self._lock()
+            self.all().delete()
+            self.bulk_create(
+                LeaderboardEntry(
+                    board=LeaderboardEntry.OVERALL,
+                    user_id=pk,
+                    value=pages,
+                )
+                for pk, pages in contributors.annotate(
+                    pages=F('pages_cleaned') + F('pages_approved'),
+                ).order_by(
+                    '-pages', 'pk',
+                ).values_list(
+                    'pk', 'pages',
+                )[:LEADERBOARD_SIZE]
+            )
+            self.bulk_create(
+                LeaderboardEntry(
+                    board=LeaderboardEntry.RECENT,
+                    user_id=pk,
+                    value=score_rank(score, score_updated),
+                )
+                for pk, score, score_updated in contributors.annotate(
+                    decayed_score=DecayedScore(),
+                ).order_by(
+                    '-decayed_score', 'pk',
+                ).values_list(
+                    'pk', 'score', 'score_updated',
+                )[:LEADERBOARD_SIZE]
+            )
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Someone in the top LEADERBOARD_SIZE of a leaderboard, so the
+    homepage needn't sort every user to find them.
+    """
+    OVERALL = 'overall'
+    RECENT = 'recent'
+    BOARDS = (
+        (OVERALL, _('All time')),
+        (RECENT, _('Recently')),
+    )
+
+    board = models.CharField(max_length=10, choices=BOARDS)
+    user = models.ForeignKey(User, related_name='leaderboard_entries')
+    value = models.FloatField()
+
+    objects = LeaderboardEntryManager()
+
+    @classmethod
+    def values(cls, pages_cleaned, pages_approved, score, score_updated):
+        """What each leaderboard is ordered by."""
+        return {
+            cls.OVERALL: pages_cleaned + pages_approved,
+            cls.RECENT: score_rank(score, score_updated),
+        }
+
+    def __unicode__(self):
+        return _(u"%(user)s on %(board)s") % {
+            'user': self.user.name,
+            'board': self.get_board_display(),
+        }
+
+    class Meta:
+        unique_together = ('board', 'user')
+        index_together = [ ('board', 'value') ]
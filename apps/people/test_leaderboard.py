@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django_webtest import WebTest
+from StringIO import StringIO
+from unittest import skipUnless
+import os.path
+import threading
+
+from apps.transcripts.factories import *
+from .models import LeaderboardEntry, LEADERBOARD_SIZE, User
+
+
+def _names(users):
+    return [ user.name for user in users ]
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class Leaderboards(TestCase):
+
+    def _clean(self, mission, user, pages):
+        for i in range(pages):
+            page = mission.next_page_for_user(user)
+            page.create_revision(u"Cleaned by %s." % user.name, user)
+
+    def test_cleaning(self):
+        """Cleaning pages moves people up the leaderboards."""
+        mission = MissionFactory()
+        PageFactory.create_batch(3, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        self._clean(mission, users[0], 1)
+        self._clean(mission, users[1], 2)
+        self.assertEqual(
+            _names(reversed(users)),
+            _names(LeaderboardEntry.objects.top(LeaderboardEntry.OVERALL)),
+        )
+        self.assertEqual(
+            _names(reversed(users)),
+            _names(LeaderboardEntry.objects.top(LeaderboardEntry.RECENT)),
+        )
+
+    def test_full(self):
+        """Only the top people are kept, and rebuilding agrees."""
+        mission = MissionFactory()
+        PageFactory.create_batch(3, mission=mission)
+        users = UserFactory.create_batch(LEADERBOARD_SIZE + 2)
+
+        for user in users[:LEADERBOARD_SIZE]:
+            self._clean(mission, user, 1)
+        # not enough to get on
+        users[-2].pages_cleaned = 1
+        users[-2].save()
+        # but cleaning more is
+        self._clean(mission, users[-1], 2)
+
+        top = _names(LeaderboardEntry.objects.top(LeaderboardEntry.OVERALL))
+        self.assertEqual(LEADERBOARD_SIZE, len(top))
+        self.assertEqual(users[-1].name, top[0])
+        self.assertNotIn(users[-2].name, top)
+        self.assertEqual(
+            LEADERBOARD_SIZE,
+            LeaderboardEntry.objects.filter(
+                board=LeaderboardEntry.OVERALL,
+            ).count(),
+        )
+
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(
+            top,
+            _names(LeaderboardEntry.objects.top(LeaderboardEntry.OVERALL)),
+        )
+
+
+@skipUnless(
+    connection.vendor == 'postgresql',
+    "Concurrent saves need a database with row locks.",
+)
+class ConcurrentLeaderboards(TransactionTestCase):
+
+    def _record_at_once(self, users):
+        errors = []
+        start = threading.Event()
+
+        def record(user):
+            try:
+                start.wait()
+                with transaction.atomic():
+                    User.objects.filter(
+                        pk=user.pk,
+                    ).update(
+                        pages_cleaned=F('pages_cleaned') + 1,
+                    )
+                    LeaderboardEntry.objects.record(user.pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=record, args=(user,)) for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+
+    def test_same_user(self):
+        """Someone saving twice at once is on each board once."""
+        user = UserFactory()
+        self._record_at_once([ user ] * 5)
+        self.assertEqual(
+            1,
+            LeaderboardEntry.objects.filter(
+                board=LeaderboardEntry.OVERALL,
+            ).count(),
+        )
+
+    def test_many_users(self):
+        """Lots of people saving at once don't overfill the boards."""
+        users = UserFactory.create_batch(LEADERBOARD_SIZE + 10)
+        self._record_at_once(users)
+        for board, _name in LeaderboardEntry.BOARDS:
+            self.assertEqual(
+                LEADERBOARD_SIZE,
+                LeaderboardEntry.objects.filter(board=board).count(),
+            )
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class Homepage(WebTest):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_leaderboards(self):
+        mission = MissionFactory()
+        PageFactory.create_batch(1, mission=mission)
+        user = UserFactory(name=u"Alan Shepard")
+        page = mission.next_page_for_user(user)
+        page.create_revision(u"Cleaned.", user)
+
+        resp = self.app.get(reverse('homepage'))
+        resp.mustcontain(u"Alan Shepard: 1 cleaned.")
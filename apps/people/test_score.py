@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+import os.path
+
+from apps.transcripts.factories import *
+from .models import (
+    DecayedScore,
+    score_decay,
+    score_rank,
+    SCORE_HALF_LIFE,
+    User,
+)
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class Score(TestCase):
+
+    def test_decay(self):
+        """A contribution counts for half as much after each half-life."""
+        now = timezone.now()
+        self.assertAlmostEqual(0.5, score_decay(now - SCORE_HALF_LIFE, now))
+        self.assertAlmostEqual(
+            0.25,
+            score_decay(now - 2 * SCORE_HALF_LIFE, now),
+        )
+
+    def test_contributions(self):
+        """Cleaning a page adds one to the current score."""
+        mission = MissionFactory()
+        PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+
+        page = mission.next_page_for_user(user)
+        page.create_revision(u"Cleaned.", user)
+        self.assertAlmostEqual(
+            1,
+            User.objects.get(pk=user.pk).current_score,
+            places=3,
+        )
+
+        # a half-life later, the first is worth a half
+        User.objects.filter(
+            pk=user.pk,
+        ).update(
+            score_updated=timezone.now() - SCORE_HALF_LIFE,
+        )
+        page = mission.next_page_for_user(user)
+        page.create_revision(u"Cleaned.", user)
+        self.assertAlmostEqual(
+            1.5,
+            User.objects.get(pk=user.pk).current_score,
+            places=3,
+        )
+
+    def test_ordering(self):
+        """Recent contributions outrank more, older ones."""
+        now = timezone.now()
+        old = UserFactory(score=3, score_updated=now - 2 * SCORE_HALF_LIFE)
+        recent = UserFactory(score=1, score_updated=now - timedelta(hours=1))
+        ancient = UserFactory(
+            score=100,
+            score_updated=now - timedelta(days=3650),
+        )
+        self.assertEqual(
+            [ recent, old, ancient ],
+            list(
+                User.objects.annotate(
+                    decayed_score=DecayedScore(now),
+                ).order_by('-decayed_score')
+            ),
+        )
+        self.assertAlmostEqual(0.75, old.current_score, places=3)
+        self.assertTrue(
+            score_rank(1, recent.score_updated) >
+            score_rank(3, old.score_updated) >
+            score_rank(100, ancient.score_updated)
+        )
+
+    def test_far_future(self):
+        """Scores don't overflow however long we run."""
+        when = datetime(2200, 1, 1, tzinfo=timezone.utc)
+        self.assertAlmostEqual(
+            score_rank(1, when) + 1,
+            score_rank(2, when),
+        )
+        user = UserFactory(score=1, score_updated=when)
+        self.assertAlmostEqual(
+            1,
+            User.objects.annotate(
+                decayed_score=DecayedScore(when),
+            ).get(pk=user.pk).decayed_score,
+        )
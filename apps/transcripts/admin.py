@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils import timezone
 from django.utils.timesince import timeuntil
 from django.utils.translation import ugettext_lazy as _
-from .models import Mission, Page, Revision
+from .models import ExportJob, Mission, Page, Revision
 
 
 class MissionAdmin(admin.ModelAdmin):
@@ -34,7 +34,7 @@ class RevisionInline(admin.StackedInline):
     max_num = 0
     extra = 0
 
-    readonly_fields = [ 'text', 'by', 'when', ]
+    readonly_fields = [ 'text', 'by', 'when', 'approval', ]
 
 class PageAdmin(admin.ModelAdmin):
     model = Page
@@ -73,6 +73,33 @@ class PageAdmin(admin.ModelAdmin):
         return obj.revisions.count()
     n_revisions.short_description = _(u'# revisions')
 
-    
+
+class ExportJobAdmin(admin.ModelAdmin):
+    model = ExportJob
+    list_display = (
+        'mission',
+        'status',
+        'pages_done',
+        'pages_total',
+        'requested_by',
+        'created',
+        'finished',
+    )
+    list_filter = (
+        'status',
+        'mission',
+    )
+    readonly_fields = [
+        'watermark',
+        'pages_done',
+        'pages_total',
+        'archive',
+        'error',
+        'started',
+        'finished',
+    ]
+
+
 admin.site.register(Mission, MissionAdmin)
 admin.site.register(Page, PageAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from optparse import make_option
+
+from apps.transcripts.models import Contribution, Page, Revision
+
+
+class Command(BaseCommand):
+    help = """Work out how many pages each person has cleaned and approved on
+each mission from their revisions, marking which revisions were approvals
+as we go.
+
+These are kept up to date as revisions are added and deleted (and were
+filled in for older revisions by a migration), so this is only needed
+to repair them. Pages are read a chunk at a time, in order. Pages
+cleaned while this runs may be missed, so run it when things are
+quiet."""
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--chunk-size',
+            type='int',
+            default=1000,
+            help='Pages to read at once (default 1000).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+        # (mission id, user id) -> [ pages cleaned, pages approved ]
+        counts = {}
+        last_pk = 0
+        while True:
+            pages = list(
+                Page.objects.filter(
+                    pk__gt=last_pk,
+                ).order_by(
+                    'pk',
+                ).values_list(
+                    'pk', 'mission_id', 'original_text',
+                )[:options['chunk_size']]
+            )
+            if len(pages) == 0:
+                break
+            last_pk = pages[-1][0]
+            missions = dict((pk, mission_id) for pk, mission_id, _ in pages)
+            texts = dict((pk, text) for pk, _, text in pages)
+
+            # a revision approves the page if it doesn't change the text
+            approvals = { True: [], False: [] }
+            for pk, page_id, by_id, text, approval in Revision.objects.filter(
+                page_id__in=texts.keys(),
+            ).order_by(
+                'page_id', 'when', 'pk',
+            ).values_list(
+                'pk', 'page_id', 'by_id', 'text', 'approval',
+            ):
+                approved = text == texts[page_id]
+                texts[page_id] = text
+                if approved != approval:
+                    approvals[approved].append(pk)
+                counts.setdefault(
+                    (missions[page_id], by_id),
+                    [ 0, 0 ],
+                )[approved] += 1
+
+            with transaction.atomic():
+                for approval, pks in approvals.items():
+                    if pks:
+                        Revision.objects.filter(
+                            pk__in=pks,
+                        ).update(
+                            approval=approval,
+                        )
+            if verbosity > 1:
+                self.stdout.write(u" * up to page id %i" % last_pk)
+
+        with transaction.atomic():
+            Contribution.objects.update(pages_cleaned=0, pages_approved=0)
+            for (mission_id, user_id), (cleaned, approved) in counts.items():
+                Contribution.objects.filter(
+                    mission_id=mission_id,
+                    user_id=user_id,
+                ).update(
+                    pages_cleaned=cleaned,
+                    pages_approved=approved,
+                )
+        self.stdout.write(
+            u"Counted pages for %i contributions." % len(counts)
+        )
@@ -0,0 +1,142 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from optparse import make_option
+import time
+
+from apps.people.models import User
+from apps.transcripts.models import *
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = """Benchmark picking the next page to clean on a large mission.
+
+Seeds a throwaway mission (rolled back afterwards) with lots of pages and
+revisions, then times finding the next page for someone who has already
+revised most of them, both with an anti-join against revisions and with
+their Contribution bitmap."""
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--pages',
+            type='int',
+            default=10000,
+            help='Pages in the mission (default 10000).',
+        ),
+        make_option(
+            '--revisions',
+            type='int',
+            default=100000,
+            help='Revisions across the mission (default 100000).',
+        ),
+        make_option(
+            '--repeat',
+            type='int',
+            default=20,
+            help='Times to run each query (default 20).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._benchmark(
+                    options['pages'],
+                    options['revisions'],
+                    options['repeat'],
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _benchmark(self, n_pages, n_revisions, repeat):
+        self.stdout.write(
+            u"Seeding %i pages and %i revisions..." % (n_pages, n_revisions)
+        )
+        now = timezone.now()
+        mission = Mission.objects.create(
+            name="Benchmark Mission",
+            short_name="BENCH",
+            start=now.date(),
+            end=now.date(),
+            patch="benchmark-patch.png",
+            # so Django doesn't try to read the (missing) image
+            patch_width=1,
+            patch_height=1,
+        )
+        Page.objects.bulk_create(
+            Page(
+                mission=mission,
+                number=number,
+                original="benchmark-page-%i.png" % number,
+                original_width=1,
+                original_height=1,
+                original_text=u"Page %i." % number,
+            )
+            for number in range(1, n_pages + 1)
+        )
+        pages = list(
+            mission.pages.order_by('number').values_list('pk', 'number')
+        )
+
+        # Each cleaner revises every page (except the last few for the
+        # one we're benchmarking), until we have enough revisions.
+        n_users = (n_revisions + n_pages - 1) // n_pages
+        users = [
+            User.objects.create(
+                email="benchmark-%i@example.com" % i,
+                name="Benchmark %i" % i,
+            )
+            for i in range(n_users)
+        ]
+        user = users[0]
+        remaining = n_revisions
+        for cleaner in users:
+            revised = pages[:min(remaining, n_pages - 10)]
+            Revision.objects.bulk_create(
+                (
+                    Revision(page_id=pk, text=u"Cleaned.", by=cleaner)
+                    for pk, number in revised
+                ),
+                batch_size=5000,
+            )
+            # bulk_create doesn't send post_save, so fill in the bitmap
+            contribution = Contribution(mission=mission, user=cleaner)
+            for pk, number in revised:
+                contribution.mark_revised(number)
+            contribution.save()
+            remaining -= len(revised)
+
+        anti_join = mission.pages.filter(
+            approved=False,
+        ).exclude(
+            revisions__by=user,
+        ).order_by('number')
+        bitmap = mission.pages.filter(
+            approved=False,
+        ).extra(
+            where=[ NOT_REVISED_SQL ],
+            params=[ mission.pk, user.pk ],
+        ).order_by('number')
+
+        for name, candidates in (
+            ('anti-join', anti_join),
+            ('bitmap', bitmap),
+        ):
+            timings = []
+            for i in range(repeat):
+                started = time.time()
+                pk = candidates.values_list('pk', flat=True).first()
+                timings.append(time.time() - started)
+            timings.sort()
+            self.stdout.write(
+                u"%-10s page %s, median %.2fms, max %.2fms" % (
+                    name,
+                    pk,
+                    timings[len(timings) // 2] * 1000,
+                    timings[-1] * 1000,
+                )
+            )
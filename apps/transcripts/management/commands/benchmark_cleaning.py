@@ -0,0 +1,231 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from optparse import make_option
+import os.path
+import random
+import threading
+import time
+
+from apps.people.models import LeaderboardEntry
+from apps.transcripts.factories import *
+from apps.transcripts.models import Page
+from lib.benchmark import percentile, THREADS_CAVEAT
+
+
+PASSWORD = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = """Load test cleaning with lots of people at once.
+
+Seeds a mission and users in the local database, then has each user (in
+their own thread) repeatedly claim a page, load it and save a revision,
+through the real views. Reports throughput, latency percentiles for each
+step, and how often people collided over locks. Everything seeded is
+deleted afterwards, and the leaderboards (which the benchmark users will
+have pushed real people off) rebuilt.
+
+""" + THREADS_CAVEAT
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--users',
+            type='int',
+            default=20,
+            help='People cleaning at once (default 20).',
+        ),
+        make_option(
+            '--pages',
+            type='int',
+            default=500,
+            help='Pages in the mission (default 500).',
+        ),
+        make_option(
+            '--rounds',
+            type='int',
+            default=None,
+            help='Stop each person after this many pages (default: '
+                 'until there are none left).',
+        ),
+        make_option(
+            '--think',
+            type='float',
+            default=0,
+            help='Seconds each person spends on a page (default 0).',
+        ),
+        make_option(
+            '--approve-rate',
+            type='float',
+            default=0.5,
+            help='Fraction of saves that approve rather than edit '
+                 '(default 0.5).',
+        ),
+        make_option(
+            '--lease-size',
+            type='int',
+            default=None,
+            help='Override PAGE_LEASE_SIZE.',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        overrides = {
+            'ALLOWED_HOSTS': [ 'testserver' ],
+            'MEDIA_ROOT': os.path.join(
+                settings.BASE_DIR,
+                'apps/transcripts/test_media',
+            ),
+            'PASSWORD_HASHERS': [
+                'django.contrib.auth.hashers.MD5PasswordHasher',
+            ],
+        }
+        if options['lease_size'] is not None:
+            overrides['PAGE_LEASE_SIZE'] = options['lease_size']
+
+        with override_settings(**overrides):
+            mission = MissionFactory()
+            PageFactory.create_batch(options['pages'], mission=mission)
+            users = UserFactory.create_batch(options['users'])
+            for user in users:
+                user.set_password(PASSWORD)
+                user.save()
+            try:
+                self._benchmark(mission, users, options)
+            finally:
+                for user in users:
+                    user.delete()
+                mission.delete()
+                LeaderboardEntry.objects.rebuild()
+
+    def _benchmark(self, mission, users, options):
+        results = []
+        start = threading.Event()
+        threads = [
+            threading.Thread(
+                target=self._clean,
+                args=(mission, user, options, start, results),
+            )
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        started = time.time()
+        start.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started
+
+        timings = { 'claim': [], 'page': [], 'save': [] }
+        counts = { 'saved': 0, 'collisions': 0, 'lock_expired': 0 }
+        for result in results:
+            for step in timings:
+                timings[step].extend(result[step])
+            for count in counts:
+                counts[count] += result[count]
+
+        self.stdout.write(
+            u"%i people cleaned %i pages in %.2fs: %.1f pages/s." % (
+                len(users),
+                counts['saved'],
+                elapsed,
+                counts['saved'] / elapsed,
+            )
+        )
+        for step in ('claim', 'page', 'save'):
+            self.stdout.write(
+                u"%-6s n=%-6i p50 %7.1fms  p95 %7.1fms  p99 %7.1fms" % (
+                    step,
+                    len(timings[step]),
+                    percentile(timings[step], 50) * 1000,
+                    percentile(timings[step], 95) * 1000,
+                    percentile(timings[step], 99) * 1000,
+                )
+            )
+        attempts = max(len(timings['save']), 1)
+        self.stdout.write(
+            u"Lock collisions: %i (%.1f%%); lock expired on save: %i "
+            u"(%.1f%%)." % (
+                counts['collisions'],
+                100.0 * counts['collisions'] / max(len(timings['page']), 1),
+                counts['lock_expired'],
+                100.0 * counts['lock_expired'] / attempts,
+            )
+        )
+        self.stdout.write(
+            u"Pages left uncleaned by anyone: %i." % (
+                Page.objects.filter(
+                    mission=mission,
+                    latest_revision__isnull=True,
+                ).count(),
+            )
+        )
+
+    def _clean(self, mission, user, options, start, results):
+        result = {
+            'claim': [],
+            'page': [],
+            'save': [],
+            'saved': 0,
+            'collisions': 0,
+            'lock_expired': 0,
+        }
+        try:
+            client = Client()
+            client.login(username=user.email, password=PASSWORD)
+            clean_next = reverse(
+                'mission-clean-next',
+                kwargs={ 'slug': mission.short_name },
+            )
+            homepage = reverse('homepage')
+            url = clean_next
+            start.wait()
+
+            while options['rounds'] is None or result['saved'] < options['rounds']:
+                if url == clean_next:
+                    began = time.time()
+                    resp = client.get(url)
+                    result['claim'].append(time.time() - began)
+                    url = _path(resp['Location'])
+                    if url == homepage:
+                        break
+
+                began = time.time()
+                resp = client.get(url)
+                result['page'].append(time.time() - began)
+                if 'name="text"' not in resp.content:
+                    # claimed, but someone else has it
+                    result['collisions'] += 1
+                    url = clean_next
+                    continue
+
+                if options['think'] > 0:
+                    time.sleep(options['think'])
+                text = Page.objects.select_related(
+                    'latest_revision',
+                ).get(
+                    mission=mission,
+                    number=int(url.strip('/').split('/')[-1]),
+                ).text
+                if random.random() >= options['approve_rate']:
+                    text += u"\nCleaned by %s." % user.name
+
+                began = time.time()
+                resp = client.post(url, { 'text': text })
+                result['save'].append(time.time() - began)
+                if resp.status_code == 302:
+                    result['saved'] += 1
+                    url = _path(resp['Location'])
+                else:
+                    result['lock_expired'] += 1
+                    url = clean_next
+        finally:
+            results.append(result)
+            connection.close()
+
+
+def _path(location):
+    """Strip the scheme and host Django adds to redirects."""
+    return '/' + location.split('://', 1)[-1].split('/', 1)[-1]
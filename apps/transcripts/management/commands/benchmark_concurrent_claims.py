@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from optparse import make_option
+import os.path
+import threading
+import time
+
+from apps.transcripts.factories import *
+from apps.transcripts.models import _supports_skip_locked, Page
+from lib.benchmark import percentile, THREADS_CAVEAT
+
+
+class Command(BaseCommand):
+    help = """Benchmark lots of people claiming pages at the same moment.
+
+Seeds a mission and users in the local database, then has every user (in
+their own thread) claim a lease of pages at once, timing each claim. This
+is done both with the single SKIP LOCKED update (where the database
+supports it) and with the candidates-then-guarded-update claim that other
+databases use, which is how every claim used to work. Reports latency
+percentiles, how many people came away with nothing, and any page
+claimed twice. Everything seeded is deleted afterwards. Compare the two
+methods with each other rather than reading too much into either alone.
+
+""" + THREADS_CAVEAT
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--users',
+            type='int',
+            default=50,
+            help='People claiming at once (default 50).',
+        ),
+        make_option(
+            '--lease-size',
+            type='int',
+            default=1,
+            help='Pages each person claims (default 1).',
+        ),
+        make_option(
+            '--rounds',
+            type='int',
+            default=10,
+            help='Times everyone claims, for each method (default 10).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        n_pages = options['users'] * options['lease_size'] * 2
+        with override_settings(
+            MEDIA_ROOT=os.path.join(
+                settings.BASE_DIR,
+                'apps/transcripts/test_media',
+            ),
+        ):
+            mission = MissionFactory()
+            PageFactory.create_batch(n_pages, mission=mission)
+            users = UserFactory.create_batch(options['users'])
+            try:
+                self._benchmark(mission, users, options)
+            finally:
+                for user in users:
+                    user.delete()
+                mission.delete()
+
+    def _benchmark(self, mission, users, options):
+        methods = [ ('conditional', mission._claim_pages_conditional) ]
+        if _supports_skip_locked(connection):
+            methods.insert(
+                0,
+                ('skip-locked', mission._claim_pages_skip_locked),
+            )
+        else:
+            self.stdout.write(
+                u"This database doesn't support SKIP LOCKED, so only the "
+                u"conditional claim can be timed."
+            )
+
+        for name, claim in methods:
+            timings = []
+            empty = 0
+            doubles = 0
+            for i in range(options['rounds']):
+                Page.objects.filter(
+                    mission=mission,
+                ).update(
+                    locked_by=None,
+                    locked_until=None,
+                )
+                claimed = self._round(
+                    claim,
+                    mission.lock_period,
+                    users,
+                    options['lease_size'],
+                    timings,
+                )
+                empty += len([ pks for pks in claimed if len(pks) == 0 ])
+                pks = [ pk for pks in claimed for pk in pks ]
+                doubles += len(pks) - len(set(pks))
+
+            self.stdout.write(
+                u"%-11s n=%-5i p50 %7.1fms  p95 %7.1fms  max %7.1fms  "
+                u"empty %i  double %i" % (
+                    name,
+                    len(timings),
+                    percentile(timings, 50) * 1000,
+                    percentile(timings, 95) * 1000,
+                    percentile(timings, 100) * 1000,
+                    empty,
+                    doubles,
+                )
+            )
+
+    def _round(self, claim, lock_period, users, n, timings):
+        claimed = []
+        start = threading.Event()
+
+        def _claim(user):
+            try:
+                start.wait()
+                now = timezone.now()
+                began = time.time()
+                pages = claim(user, n, now, now + lock_period * n)
+                timings.append(time.time() - began)
+                claimed.append([ page.pk for page in pages ])
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=_claim, args=(user,)) for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        return claimed
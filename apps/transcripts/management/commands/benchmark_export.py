@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from optparse import make_option
+import time
+
+from apps.people.models import User
+from apps.transcripts.models import *
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = """Benchmark exporting missions of different sizes.
+
+For each size, seeds a throwaway mission (rolled back afterwards) where
+half the pages have been cleaned, then exports it, reporting how many
+queries and how long that took. The query count should not grow with
+the number of pages (beyond one per MissionExporter.CHUNK_SIZE)."""
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--pages',
+            default='100,1000,10000',
+            help='Comma-separated mission sizes (default 100,1000,10000).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        for n_pages in [ int(n) for n in options['pages'].split(',') ]:
+            try:
+                with transaction.atomic():
+                    self._benchmark(n_pages)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _benchmark(self, n_pages):
+        now = timezone.now()
+        mission = Mission.objects.create(
+            name="Benchmark Mission",
+            short_name="BENCH",
+            start=now.date(),
+            end=now.date(),
+            patch="benchmark-patch.png",
+            # so Django doesn't try to read the (missing) image
+            patch_width=1,
+            patch_height=1,
+        )
+        Page.objects.bulk_create(
+            Page(
+                mission=mission,
+                number=number,
+                original="benchmark-page-%i.png" % number,
+                original_width=1,
+                original_height=1,
+                original_text=u"Page %i, as it came out of OCR.\n" % number * 20,
+            )
+            for number in range(1, n_pages + 1)
+        )
+        users = [
+            User.objects.create(
+                email="benchmark-%i@example.com" % i,
+                name="Benchmark %i" % i,
+            )
+            for i in range(10)
+        ]
+        cleaned = list(
+            mission.pages.filter(
+                number__lte=n_pages // 2,
+            ).values_list('pk', 'number')
+        )
+        Revision.objects.bulk_create(
+            (
+                Revision(
+                    page_id=pk,
+                    text=u"Page %i, cleaned.\n" % number * 20,
+                    by=users[number % len(users)],
+                )
+                for pk, number in cleaned
+            ),
+            batch_size=5000,
+        )
+        for page_id, revision_id in Revision.objects.filter(
+            page__mission=mission,
+        ).values_list('page_id', 'pk'):
+            Page.objects.filter(pk=page_id).update(latest_revision=revision_id)
+
+        exporter = MissionExporter(mission)
+        size = 0
+        with CaptureQueriesContext(connection) as queries:
+            started = time.time()
+            for chunk in exporter.main_transcript_chunks():
+                size += len(chunk)
+            size += len(exporter.meta())
+            elapsed = time.time() - started
+
+        self.stdout.write(
+            u"%6i pages: %3i queries, %7.1fms, %i characters" % (
+                n_pages,
+                len(queries),
+                elapsed * 1000,
+                size,
+            )
+        )
@@ -1,20 +1,67 @@
 import errno
+import multiprocessing
 import os
+import shutil
+import time
+import traceback
 
 from django.core.management.base import BaseCommand, CommandError
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from optparse import make_option
 
 from apps.transcripts.models import Mission, MissionExporter
+from lib.media import protected_storage
 
 class Command(BaseCommand):
     help = """Export a cleaned transcript and basic metadata file for use in
 Spacelog.
 
-If a transcript name isn't passed, the default is TEC."""
+If a transcript name isn't passed, the default is TEC.
 
-    args = "<mission-short-name> <export-dir> [<transcript-name>]"
+A _manifest file lists the exported pages with a SHA-1 of each one's
+text, and a cursor. Pass that cursor as --since next time to export only
+the pages cleaned since (--since also takes an ISO 8601 timestamp).
+
+With --all or --missions, export several missions at once, each into its
+own directory (named for the mission, in lower case) under the export
+dir, using a pool of processes."""
+
+    args = "<mission-short-name> <export-dir> [<transcript-name>]\n" \
+           "       --all|--missions=<short-names> <export-dir> [<transcript-name>]"
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--all',
+            action='store_true',
+            default=False,
+            help='Export every mission.',
+        ),
+        make_option(
+            '--missions',
+            default=None,
+            help='Export these missions (short names, comma separated).',
+        ),
+        make_option(
+            '--since',
+            default=None,
+            help='Only export pages cleaned after this cursor (from a '
+                 'previous _manifest) or timestamp.',
+        ),
+        make_option(
+            '--processes',
+            type='int',
+            default=None,
+            help='Missions to export at once (default: one per CPU).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        options['since'] = _parse_since(options['since'])
+        if options['all'] or options['missions']:
+            return self._export_many(*args, **options)
 
-    def handle(self, *args, **kwargs):
         if len(args) < 2 or len(args) > 3:
             raise CommandError("Wrong number of arguments.")
 
@@ -23,26 +70,175 @@ If a transcript name isn't passed, the default is TEC."""
         except ObjectDoesNotExist:
             raise CommandError("No such mission.")
 
-        export_dir = args[1]
-        self._mkdir(os.path.join(export_dir, "transcripts"))
-
         main_transcript_name = "TEC"
         if len(args) > 2:
             main_transcript_name = args[2]
 
-        exporter = MissionExporter(mission, main_transcript_name)
+        export_mission(
+            mission.pk,
+            args[1],
+            main_transcript_name,
+            options['since'],
+        )
+
+    def _export_many(self, *args, **options):
+        if len(args) < 1 or len(args) > 2:
+            raise CommandError("Wrong number of arguments.")
+        export_root = args[0]
+        main_transcript_name = "TEC"
+        if len(args) > 1:
+            main_transcript_name = args[1]
 
-        with open(os.path.join(export_dir, exporter.main_transcript_path()), "w") as f:
-            f.write(exporter.main_transcript())
+        missions = Mission.objects.order_by('short_name')
+        if not options['all']:
+            short_names = [
+                short_name.strip()
+                for short_name in options['missions'].split(',')
+                if short_name.strip()
+            ]
+            missions = missions.filter(short_name__in=short_names)
+            missing = set(short_names) - set(
+                mission.short_name for mission in missions
+            )
+            if missing:
+                raise CommandError(
+                    "No such mission: %s." % ", ".join(sorted(missing))
+                )
+        jobs = [
+            (
+                mission.pk,
+                os.path.join(export_root, mission.short_name.lower()),
+                main_transcript_name,
+                options['since'],
+            )
+            for mission in missions
+        ]
+        if len(jobs) == 0:
+            return
 
-        with open(os.path.join(export_dir, exporter.meta_path()), "w") as f:
-            f.write(exporter.meta())
+        processes = options['processes'] or multiprocessing.cpu_count()
+        processes = min(processes, len(jobs))
+        started = time.time()
+        if processes == 1:
+            results = map(_export_mission_safely, jobs)
+        else:
+            # Each worker must open its own database connection, rather
+            # than share the one it would inherit from us.
+            for connection in connections.all():
+                connection.close()
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(_export_mission_safely, jobs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
 
-    def _mkdir(self, path):
-        try:
-            os.makedirs(path)
-        except OSError as err:
-            if err.errno == errno.EEXIST and os.path.isdir(path):
-                pass
+        failed = 0
+        for short_name, seconds, error in results:
+            if error is None:
+                self.stdout.write(u"%-10s %7.2fs" % (short_name, seconds))
             else:
-                raise CommandError("Cannot create directory '%s'" % path)
+                failed += 1
+                self.stderr.write(
+                    u"%-10s failed after %.2fs:\n%s" % (
+                        short_name,
+                        seconds,
+                        error,
+                    )
+                )
+        self.stdout.write(
+            u"Exported %i missions in %.2fs with %i processes." % (
+                len(jobs) - failed,
+                time.time() - started,
+                processes,
+            )
+        )
+        if failed:
+            raise CommandError("%i missions failed to export." % failed)
+
+
+def export_mission(mission_pk, export_dir, main_transcript_name, since=None):
+    """Export a mission into export_dir, returning its short name."""
+    mission = Mission.objects.get(pk=mission_pk)
+    _mkdir(os.path.join(export_dir, "transcripts"))
+    exporter = MissionExporter(mission, main_transcript_name, since=since)
+
+    if since is None:
+        # Copied from the export cache, which is only regenerated if
+        # there have been revisions since the last export.
+        transcript, manifest = exporter.cached_main_transcript_and_manifest()
+        _copy(
+            transcript,
+            os.path.join(export_dir, exporter.main_transcript_path()),
+        )
+        _copy(
+            manifest,
+            os.path.join(export_dir, exporter.manifest_path()),
+        )
+    else:
+        cursor = exporter.cursor()
+        with open(
+            os.path.join(export_dir, exporter.main_transcript_path()),
+            "wb",
+        ) as transcript, open(
+            os.path.join(export_dir, exporter.manifest_path()),
+            "wb",
+        ) as manifest:
+            exporter.write_main_transcript_and_manifest(
+                transcript,
+                manifest,
+                cursor,
+            )
+
+    _copy(
+        MissionExporter(mission, main_transcript_name).cached_meta(),
+        os.path.join(export_dir, exporter.meta_path()),
+    )
+    return mission.short_name
+
+
+def _parse_since(since):
+    if since is None:
+        return None
+    if since.isdigit():
+        return int(since)
+    parsed = parse_datetime(since)
+    if parsed is None:
+        raise CommandError(
+            "--since must be a cursor or an ISO 8601 timestamp."
+        )
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_current_timezone())
+    return parsed
+
+
+def _export_mission_safely(job):
+    # Runs in a pool worker, so report errors rather than raising them
+    # (which would lose the other missions' results).
+    started = time.time()
+    short_name = os.path.basename(job[1])
+    try:
+        short_name = export_mission(*job)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return short_name, time.time() - started, error
+
+
+def _copy(name, path):
+    source = protected_storage.open(name)
+    try:
+        with open(path, "wb") as f:
+            shutil.copyfileobj(source, f)
+    finally:
+        source.close()
+
+
+def _mkdir(path):
+    try:
+        os.makedirs(path)
+    except OSError as err:
+        if err.errno == errno.EEXIST and os.path.isdir(path):
+            pass
+        else:
+            raise CommandError("Cannot create directory '%s'" % path)
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from optparse import make_option
+import time
+import traceback
+
+from apps.transcripts.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = """Run queued mission exports.
+
+Jobs are queued in the database by the export view, so no other broker
+is needed, and any number of workers can run at once. By default this
+keeps polling for new jobs; with --once it stops when the queue is empty,
+which suits running it from cron."""
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--once',
+            action='store_true',
+            default=False,
+            help='Exit once there are no more queued jobs.',
+        ),
+        make_option(
+            '--poll',
+            type='float',
+            default=5,
+            help='Seconds to wait between checks for jobs (default 5).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+        while True:
+            job = ExportJob.objects.claim()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                # don't hang on to a connection the database has dropped
+                close_old_connections()
+                continue
+
+            started = time.time()
+            try:
+                job.run()
+            except Exception:
+                self.stderr.write(
+                    u"%s export %i of %s failed:\n%s" % (
+                        timezone.now().isoformat(),
+                        job.pk,
+                        job.mission.short_name,
+                        traceback.format_exc(),
+                    )
+                )
+                continue
+            if verbosity > 0:
+                self.stdout.write(
+                    u"%s exported %s (%i pages) in %.1fs." % (
+                        timezone.now().isoformat(),
+                        job.mission.short_name,
+                        job.pages_total,
+                        time.time() - started,
+                    )
+                )
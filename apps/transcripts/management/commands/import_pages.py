@@ -1,12 +1,30 @@
+from collections import deque
+from contextlib import closing
 from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.images import get_image_dimensions
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
+from multiprocessing.pool import ThreadPool
 from optparse import make_option
+import hashlib
 import os.path
+import re
+import tarfile
+import time
+import zipfile
 
 from apps.transcripts.models import *
 
 
+# Fields that stop being used when a page's image is replaced.
+REPLACED_FIELDS = ('original', 'screen', 'thumbnail', 'tiles')
+
+# Page images and text in an archive, in any directory.
+ARCHIVE_PAGE_RE = re.compile(r'(?:^|/)page-(\d+)\.(png|txt)$')
+
+
 class Command(BaseCommand):
     help = """Import images and text for mission transcript pages.
 
@@ -24,52 +42,453 @@ or with ghostscript 9.18 (eg in homebrew):
 
 Note that PNGs will be 0-indexed where text is 1-indexed, because tool
 consistency between ImageMagick and ghostscript would destroy the
-universe."""
+universe.
+
+Images are copied into storage, measured and scaled down for the screen
+by a pool of threads, and pages are committed a batch at a time. If an
+import is interrupted (or hits a bad file), fix the problem and run it
+again with --resume to carry on after the last page committed.
+
+Re-importing a mission (say, after a re-OCR) only stores images and
+updates text that have changed, comparing them with the SHA-1 hashes
+kept on each page. Images it replaces are deleted, along with their
+renditions and tiles (unless another page still uses them).
+
+Rather than directories, you can give a zip or tar file (optionally
+compressed) of page-NNN.png and page-NNN.txt files with --archive. It's
+read straight through, without unpacking it anywhere."""
     option_list = BaseCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=100,
+            help='Pages to commit at once (default 100).',
+        ),
+        make_option(
+            '--workers',
+            type='int',
+            default=8,
+            help='Threads copying and measuring images (default 8).',
+        ),
+        make_option(
+            '--resume',
+            action='store_true',
+            default=False,
+            help='Start after the last page already imported.',
+        ),
+        make_option(
+            '--no-renditions',
+            action='store_false',
+            dest='renditions',
+            default=True,
+            help="Don't make screen and thumbnail renditions of the "
+                 "images (make_renditions can do it later).",
+        ),
+        make_option(
+            '--archive',
+            default=None,
+            help='Read images and text from this zip or tar file (which '
+                 'may be compressed), rather than from directories.',
+        ),
     )
-    args = "<mission-short-name> <png-dir> <text-dir> [<start-page> [<end-page]]"
+    args = "<mission-short-name> <png-dir> <text-dir> [<start-page> [<end-page]]\n" \
+           "       --archive=<zip-or-tar> <mission-short-name> [<start-page> [<end-page]]"
 
     def handle(self, *args, **options):
         verbosity = int(options['verbosity'])
 
-        if len(args) < 3 or len(args) > 5:
-            raise CommandError("Wrong number of arguments.")
-        
+        if options['archive']:
+            if len(args) < 1 or len(args) > 3:
+                raise CommandError("Wrong number of arguments.")
+            numbers = args[1:]
+        else:
+            if len(args) < 3 or len(args) > 5:
+                raise CommandError("Wrong number of arguments.")
+            numbers = args[3:]
+
         mission = Mission.objects.get(short_name=args[0])
         self.stdout.write(u"Importing for mission %s." % mission.name)
-        
-        png_dir = args[1]
-        text_dir = args[2]
+
         page = 1
         end = None
+        skip = set()
+        # what's already there, so re-imports only write what's changed
+        current = dict(
+            (number, (pk, original, original_hash, original_text_hash))
+            for number, pk, original, original_hash, original_text_hash
+            in mission.pages.values_list(
+                'number',
+                'pk',
+                'original',
+                'original_hash',
+                'original_text_hash',
+            )
+        )
+
+        if len(numbers) > 0:
+            if options['resume']:
+                raise CommandError("Can't give a start page with --resume.")
+            page = int(numbers[0])
+        if len(numbers) > 1:
+            end = int(numbers[1])
+        if options['resume'] and options['archive']:
+            # archives can be in any order, so skip whatever's been done
+            skip = set(current)
+            self.stdout.write(u"Skipping %i pages already imported." % len(skip))
+        elif options['resume']:
+            # each batch is committed in page order, so the last page
+            # imported is where we got to
+            if current:
+                page = max(current) + 1
+                self.stdout.write(u"Resuming from page %i." % page)
 
-        if len(args) > 3:
-            page = int(args[3])
-        if len(args) > 4:
-            end = int(args[4])
-
-        with transaction.atomic():
-            # We don't os.listdir() because we need to know which page number
-            # we're dealing with.
-            #
-            # Remember that PNGs are 0-indexed.
-            while end is None or page < end:
-                png_fname = os.path.join(png_dir, "page-%3.3i.png" % (page-1))
-                text_fname = os.path.join(text_dir, "page-%3.3i.txt" % page)
-                if not (
-                    os.path.exists(png_fname) and os.path.exists(text_fname)
-                ):
-                    break
-
-                self.stdout.write(u" * page %i\n" % page)
-            
-                with open(text_fname, 'r') as text_f:
-                    text = text_f.read().decode('iso-8859-1')
-                with open(png_fname, 'r') as png_f:
-                    p = Page.objects.create(
-                        mission = mission,
-                        number = page,
-                        original = File(png_f),
-                        original_text = text,
+        started = time.time()
+        totals = { 'new': 0, 'changed': 0, 'unchanged': 0 }
+        pool = ThreadPool(options['workers'])
+        try:
+            if options['archive']:
+                batches = _archive_batches(
+                    pool,
+                    mission,
+                    options['archive'],
+                    page,
+                    end,
+                    skip,
+                    current,
+                    options,
+                    self.stderr,
+                )
+            else:
+                batches = _directory_batches(
+                    pool,
+                    mission,
+                    args[1],
+                    args[2],
+                    page,
+                    end,
+                    current,
+                    options,
+                )
+            for changes in batches:
+                counts = _commit(mission, changes)
+                for count in totals:
+                    totals[count] += counts[count]
+                if verbosity > 0:
+                    self.stdout.write(
+                        u" * pages %i-%i: %i new, %i changed" % (
+                            changes[0][0],
+                            changes[-1][0],
+                            counts['new'],
+                            counts['changed'],
+                        )
                     )
-                page += 1
+        finally:
+            pool.close()
+            pool.join()
+
+        self.stdout.write(
+            u"Imported %i new pages and %i changed ones (%i unchanged) "
+            u"in %.1fs." % (
+                totals['new'],
+                totals['changed'],
+                totals['unchanged'],
+                time.time() - started,
+            )
+        )
+
+
+def _commit(mission, changes):
+    """
+    Save a batch of (number, pk, fields) changes: new pages (with no pk)
+    are created, and existing ones updated with whatever fields changed;
+    images, renditions and tiles they've replaced are then deleted.
+    Returns counts of new, changed and unchanged pages.
+    """
+    new = [
+        Page(mission=mission, number=number, **fields)
+        for number, pk, fields in changes
+        if pk is None
+    ]
+    changed = [
+        (pk, fields)
+        for number, pk, fields in changes
+        if pk is not None and fields
+    ]
+    replaced = [ pk for pk, fields in changed if 'original' in fields ]
+    with transaction.atomic():
+        # read before they're overwritten
+        previous = list(
+            Page.objects.filter(
+                pk__in=replaced,
+            ).values_list('pk', *REPLACED_FIELDS)
+        )
+        Page.objects.bulk_create(new)
+        for pk, fields in changed:
+            Page.objects.filter(pk=pk).update(**fields)
+        if new or changed:
+            # so exports notice
+            Mission.objects.filter(
+                pk=mission.pk,
+            ).update(
+                pages_updated=timezone.now(),
+            )
+    if replaced:
+        _delete_replaced(previous, dict(changed))
+    return {
+        'new': len(new),
+        'changed': len(changed),
+        'unchanged': len(changes) - len(new) - len(changed),
+    }
+
+
+def _delete_replaced(previous, changed):
+    """Delete images, renditions and tiles that pages no longer use,
+    given their previous values and the fields they were updated with."""
+    names = []
+    keys = []
+    for values in previous:
+        fields = changed[values[0]]
+        for name, value in zip(REPLACED_FIELDS, values[1:]):
+            if name in fields and fields[name] != value:
+                (keys if name == 'tiles' else names).append(value)
+    Page.delete_unused_images(names, keys)
+
+
+def _directory_batches(pool, mission, png_dir, text_dir, page, end,
+                       current, options):
+    """Yield batches of page changes from PNG and text directories."""
+    for batch in _batches(
+        _page_files(png_dir, text_dir, page, end),
+        options['batch_size'],
+    ):
+        yield pool.map(
+            lambda files: _store_page(
+                mission,
+                *files,
+                renditions=options['renditions'],
+                current=current.get(files[0])
+            ),
+            batch,
+        )
+
+
+def _archive_batches(pool, mission, path, page, end, skip, current, options,
+                     stderr):
+    """
+    Yield batches of page changes from a zip or tar archive, reading it
+    once from start to finish.
+
+    Each image is stored as soon as it's read, and only its name and
+    size kept until its text turns up (or the other way round), so
+    images don't pile up in memory whatever order the archive is in.
+    Images whose text never turns up are deleted again at the end.
+    """
+    texts = {}
+    images = {}
+    ready = []
+    storing = deque()
+    for name, f in _archive_entries(path):
+        match = ARCHIVE_PAGE_RE.search(name)
+        if match is None:
+            continue
+        number = int(match.group(1))
+        if match.group(2) == 'png':
+            # remember PNGs are 0-indexed
+            number += 1
+        if number < page or (end is not None and number >= end):
+            continue
+        if number in skip:
+            continue
+
+        if match.group(2) == 'txt':
+            texts[number] = f.read().decode('iso-8859-1')
+        else:
+            images[number] = pool.apply_async(
+                _store_image,
+                (
+                    mission,
+                    os.path.basename(name),
+                    ContentFile(f.read()),
+                    options['renditions'],
+                    current.get(number),
+                ),
+            )
+            storing.append(images[number])
+            # don't read further ahead than the workers can keep up with
+            while len(storing) > 2 * options['workers']:
+                storing.popleft().wait()
+
+        if number in texts and number in images:
+            ready.append(number)
+        if len(ready) == options['batch_size']:
+            yield _archive_changes(sorted(ready), texts, images, current)
+            ready = []
+    if ready:
+        yield _archive_changes(sorted(ready), texts, images, current)
+
+    for number in sorted(set(texts) | set(images)):
+        stderr.write(
+            u"Page %i has no %s in the archive; skipped." % (
+                number,
+                "image" if number in texts else "text",
+            )
+        )
+        if number in images:
+            # already stored, but nothing will ever point at it
+            _discard_image(images[number])
+
+
+def _archive_changes(numbers, texts, images, current):
+    changes = []
+    for number in numbers:
+        fields = images.pop(number).get()
+        fields.update(_text_changes(texts.pop(number), current.get(number)))
+        changes.append(
+            (number, current.get(number, (None,))[0], fields)
+        )
+    return changes
+
+
+def _discard_image(stored):
+    """Delete an image (and renditions) stored by _store_image()."""
+    try:
+        fields = stored.get()
+    except CommandError:
+        # couldn't be read, so nothing was stored
+        return
+    for name in [ 'original' ] + [ name for name, width in RENDITIONS ]:
+        if fields.get(name):
+            Page._meta.get_field(name).storage.delete(fields[name])
+
+
+def _archive_entries(path):
+    """Yield (name, file) for each file in a zip or tar archive (which
+    may be compressed), in archive order, without extracting it."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.filename.endswith('/'):
+                    continue
+                with closing(archive.open(info)) as f:
+                    yield info.filename, f
+        return
+
+    try:
+        # streamed, so it's read once without seeking back
+        archive = tarfile.open(path, 'r|*')
+    except (IOError, tarfile.TarError):
+        raise CommandError("Can't read archive %s." % path)
+    with closing(archive):
+        for info in archive:
+            if info.isfile():
+                yield info.name, archive.extractfile(info)
+
+
+def _page_files(png_dir, text_dir, page, end):
+    """Yield (number, png filename, text filename) until one is missing."""
+    # We don't os.listdir() because we need to know which page number
+    # we're dealing with.
+    #
+    # Remember that PNGs are 0-indexed.
+    while end is None or page < end:
+        png_fname = os.path.join(png_dir, "page-%3.3i.png" % (page-1))
+        text_fname = os.path.join(text_dir, "page-%3.3i.txt" % page)
+        if not (
+            os.path.exists(png_fname) and os.path.exists(text_fname)
+        ):
+            break
+        yield page, png_fname, text_fname
+        page += 1
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _store_page(mission, number, png_fname, text_fname, renditions, current):
+    """
+    Copy a page's image into storage if it's new or changed, and read
+    its text, returning (number, pk if it exists, fields to set).
+    (Runs in a worker thread, so doesn't touch the database.)
+    """
+    with open(text_fname, 'r') as text_f:
+        text = text_f.read().decode('iso-8859-1')
+    with open(png_fname, 'rb') as png_f:
+        fields = _store_image(
+            mission,
+            os.path.basename(png_fname),
+            File(png_f),
+            renditions,
+            current,
+        )
+    fields.update(_text_changes(text, current))
+    return number, current and current[0], fields
+
+
+def _store_image(mission, filename, f, renditions, current):
+    """
+    Save a page image (and its renditions, if wanted) into storage,
+    returning the page's field values for them; or nothing, if the
+    page's current image is the same.
+    """
+    content_hash = _sha1(f)
+    if current is not None:
+        pk, original, original_hash, original_text_hash = current
+        if not original_hash and original:
+            # imported before we kept hashes
+            field = Page._meta.get_field('original')
+            try:
+                with closing(field.storage.open(original, 'rb')) as stored:
+                    original_hash = _sha1(stored)
+            except (IOError, OSError):
+                pass
+            else:
+                if original_hash == content_hash:
+                    return { 'original_hash': original_hash }
+        if original_hash == content_hash:
+            return {}
+
+    # Measured here, and passed in with the image, so the ImageField
+    # doesn't open it again (from storage) to find out.
+    dimensions = get_image_dimensions(f)
+    if dimensions is None or dimensions[0] is None:
+        raise CommandError("Can't read image %s." % filename)
+    field = Page._meta.get_field('original')
+    image = {
+        'original': field.storage.save(
+            field.generate_filename(Page(mission=mission), filename),
+            f,
+        ),
+        'original_width': dimensions[0],
+        'original_height': dimensions[1],
+        'original_hash': content_hash,
+        # out of date now; make_tiles will make new ones
+        'tiles': '',
+    }
+    if renditions:
+        image.update(Page.store_renditions(mission, filename, f))
+    return image
+
+
+def _text_changes(text, current):
+    text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    if current is not None and current[3] == text_hash:
+        return {}
+    return {
+        'original_text': text,
+        'original_text_hash': text_hash,
+    }
+
+
+def _sha1(f):
+    content_hash = hashlib.sha1()
+    for chunk in f.chunks():
+        content_hash.update(chunk)
+    return content_hash.hexdigest()
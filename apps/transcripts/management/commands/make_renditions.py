@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from multiprocessing.pool import ThreadPool
+from optparse import make_option
+import time
+
+from apps.transcripts.models import Mission, Page
+
+
+class Command(BaseCommand):
+    help = """Make screen and thumbnail renditions of page images.
+
+import_pages makes these as it goes, so this is for pages imported
+before renditions existed (or with --no-renditions), or for remaking
+them with --all (which deletes the ones they replace). Pass mission
+short names to do just those missions."""
+    args = "[<mission-short-name> ...]"
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--all',
+            action='store_true',
+            default=False,
+            help='Remake renditions for pages that already have them.',
+        ),
+        make_option(
+            '--batch-size',
+            type='int',
+            default=100,
+            help='Pages to fetch from the database at once (default 100).',
+        ),
+        make_option(
+            '--workers',
+            type='int',
+            default=8,
+            help='Threads making renditions (default 8).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+
+        pages = Page.objects.select_related('mission').order_by('pk')
+        if args:
+            missions = Mission.objects.filter(short_name__in=args)
+            if len(missions) != len(set(args)):
+                raise CommandError("No such mission.")
+            pages = pages.filter(mission__in=missions)
+        if not options['all']:
+            pages = pages.filter(screen='')
+
+        started = time.time()
+        done = 0
+        last_pk = 0
+        pool = ThreadPool(options['workers'])
+        try:
+            while True:
+                batch = list(
+                    pages.filter(pk__gt=last_pk)[:options['batch_size']]
+                )
+                if len(batch) == 0:
+                    break
+                last_pk = batch[-1].pk
+                replaced = []
+                for page, renditions in zip(
+                    batch,
+                    pool.map(_renditions, batch),
+                ):
+                    Page.objects.filter(pk=page.pk).update(**renditions)
+                    replaced.extend([ page.screen.name, page.thumbnail.name ])
+                Page.delete_unused_images(replaced, [])
+                done += len(batch)
+                if verbosity > 0:
+                    self.stdout.write(u" * %i pages" % done)
+        finally:
+            pool.close()
+            pool.join()
+
+        self.stdout.write(
+            u"Made renditions for %i pages in %.1fs." % (
+                done,
+                time.time() - started,
+            )
+        )
+
+
+def _renditions(page):
+    # in a worker thread, so leave the database to the main one
+    page.original.open('rb')
+    try:
+        return Page.store_renditions(
+            page.mission,
+            page.original.name,
+            page.original,
+        )
+    finally:
+        page.original.close()
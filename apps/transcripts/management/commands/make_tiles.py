@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from optparse import make_option
+import multiprocessing
+import time
+import traceback
+
+from apps.transcripts.models import Mission, Page
+
+
+class Command(BaseCommand):
+    help = """Cut page images into deep zoom tiles, for zooming in on them
+while cleaning.
+
+Tiles are named for the image's content, so they can be cached forever;
+pages with the same image share them. Only pages without tiles are done,
+unless you pass --all (which also deletes tiles pages no longer use).
+Pass mission short names to do just those missions."""
+    args = "[<mission-short-name> ...]"
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--all',
+            action='store_true',
+            default=False,
+            help='Check pages that already have tiles too.',
+        ),
+        make_option(
+            '--processes',
+            type='int',
+            default=None,
+            help='Pages to tile at once (default: one per CPU).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+
+        pages = Page.objects.order_by('pk')
+        if args:
+            missions = Mission.objects.filter(short_name__in=args)
+            if len(missions) != len(set(args)):
+                raise CommandError("No such mission.")
+            pages = pages.filter(mission__in=missions)
+        if not options['all']:
+            pages = pages.filter(tiles='')
+        jobs = []
+        previous = {}
+        for pk, original, tiles in pages.values_list(
+            'pk',
+            'original',
+            'tiles',
+        ):
+            jobs.append((pk, original))
+            previous[pk] = tiles
+        if len(jobs) == 0:
+            return
+
+        processes = options['processes'] or multiprocessing.cpu_count()
+        processes = min(processes, len(jobs))
+        started = time.time()
+        if processes == 1:
+            results = (_make_tiles(job) for job in jobs)
+            pool = None
+        else:
+            # Workers don't use the database, but mustn't share our
+            # connection either.
+            for connection in connections.all():
+                connection.close()
+            pool = multiprocessing.Pool(processes)
+            results = pool.imap_unordered(_make_tiles, jobs)
+
+        done = 0
+        failed = 0
+        replaced = []
+        try:
+            for pk, key, error in results:
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(u"Page %i failed:\n%s" % (pk, error))
+                    continue
+                Page.objects.filter(pk=pk).update(tiles=key)
+                if previous[pk] != key:
+                    replaced.append(previous[pk])
+                done += 1
+                if verbosity > 1:
+                    self.stdout.write(u" * page %i" % pk)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        # tiles pages have moved on from, now nothing points at them
+        Page.delete_unused_images([], replaced)
+
+        self.stdout.write(
+            u"Made tiles for %i pages in %.1fs with %i processes." % (
+                done,
+                time.time() - started,
+                processes,
+            )
+        )
+        if failed:
+            raise CommandError("%i pages failed." % failed)
+
+
+def _make_tiles(job):
+    # Runs in a pool worker, so report errors rather than raising them.
+    pk, original = job
+    try:
+        f = Page._meta.get_field('original').storage.open(original, 'rb')
+        try:
+            return pk, Page.store_tiles(f), None
+        finally:
+            f.close()
+    except Exception:
+        return pk, None, traceback.format_exc()
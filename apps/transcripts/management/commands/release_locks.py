@@ -0,0 +1,58 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from optparse import make_option
+import time
+
+from apps.transcripts.models import Page
+
+
+class Command(BaseCommand):
+    help = """Release expired page locks; run this regularly (typically via
+cron).
+
+Locks are released in batches, oldest first, and we report how many were
+swept and how long they'd been expired for, which helps tune how often
+to run this."""
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--batch-size',
+            type='int',
+            default=1000,
+            help='Locks to release per UPDATE (default 1000).',
+        ),
+        make_option(
+            '--max-batches',
+            type='int',
+            default=10,
+            help='Stop after this many batches (default 10).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+        started = time.time()
+        now = timezone.now()
+
+        lags = []
+        for batch in range(options['max_batches']):
+            released = Page.objects.release_expired_locks(
+                batch_size=options['batch_size'],
+                now=now,
+            )
+            lags.extend(released)
+            if len(released) < options['batch_size']:
+                break
+
+        if verbosity > 0 and len(lags) > 0:
+            self.stdout.write(
+                u"%s released %i locks in %.3fs; expired for "
+                u"mean %.0fs, max %.0fs." % (
+                    now.isoformat(),
+                    len(lags),
+                    time.time() - started,
+                    sum(lags, timedelta()).total_seconds() / len(lags),
+                    max(lags).total_seconds(),
+                )
+            )
+
@@ -0,0 +1,35 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from optparse import make_option
+import time
+
+from apps.transcripts.models import ActivityBucket
+
+
+class Command(BaseCommand):
+    help = """Roll up recent revisions into hourly and daily activity for each
+mission; run this regularly (typically via cron).
+
+Each run carries on from where the last one got to, a day at a time,
+and leaves the last minute's revisions (which may not have been
+committed yet) for next time. The first run works through every
+revision, so may take a while."""
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--grace',
+            type='int',
+            default=60,
+            help='Leave revisions newer than this many seconds (default 60).',
+        ),
+    )
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+        started = time.time()
+        days = ActivityBucket.objects.roll_up(
+            grace=timedelta(seconds=options['grace']),
+        )
+        if verbosity > 1:
+            self.stdout.write(
+                u"Rolled up %i days in %.3fs." % (days, time.time() - started)
+            )
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0006_mission_wiki'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='page',
+            name='locked_until',
+            field=models.DateTimeField(db_index=True, null=True, blank=True),
+        ),
+    ]
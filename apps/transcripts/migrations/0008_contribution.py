@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transcripts', '0007_auto_20261018_2033'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contribution',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('revised_pages', models.TextField(default=b'', blank=True)),
+                ('mission', models.ForeignKey(related_name='contributions', to='transcripts.Mission')),
+                ('user', models.ForeignKey(related_name='contributions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='contribution',
+            unique_together=set([('mission', 'user')]),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def fill_revised_pages(apps, schema_editor):
+    Contribution = apps.get_model('transcripts', 'Contribution')
+    Revision = apps.get_model('transcripts', 'Revision')
+
+    revised = {}
+    for mission_id, user_id, number in Revision.objects.values_list(
+        'page__mission_id',
+        'by_id',
+        'page__number',
+    ).iterator():
+        revised.setdefault((mission_id, user_id), set()).add(number)
+
+    for (mission_id, user_id), numbers in revised.items():
+        pages = ['0'] * (max(numbers) + 1)
+        for number in numbers:
+            pages[number] = '1'
+        Contribution.objects.update_or_create(
+            mission_id=mission_id,
+            user_id=user_id,
+            defaults={ 'revised_pages': ''.join(pages) },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0008_contribution'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_revised_pages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0009_contribution_revised_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mission',
+            name='lock_duration',
+            field=models.PositiveIntegerField(default=5, help_text='Minutes someone can hold a page for while cleaning it.'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0010_mission_lock_duration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='latest_revision',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, editable=False, to='transcripts.Revision', null=True),
+        ),
+    ]
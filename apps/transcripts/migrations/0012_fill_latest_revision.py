@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+CHUNK_SIZE = 1000
+
+
+def fill_latest_revision(apps, schema_editor):
+    Page = apps.get_model('transcripts', 'Page')
+    Revision = apps.get_model('transcripts', 'Revision')
+
+    last_pk = 0
+    while True:
+        page_pks = list(
+            Page.objects.filter(
+                pk__gt=last_pk,
+            ).order_by(
+                'pk',
+            ).values_list(
+                'pk', flat=True,
+            )[:CHUNK_SIZE]
+        )
+        if len(page_pks) == 0:
+            break
+        last_pk = page_pks[-1]
+
+        latest = {}
+        for page_pk, revision_pk in Revision.objects.filter(
+            page_id__in=page_pks,
+        ).order_by(
+            'page_id', 'when', 'pk',
+        ).values_list(
+            'page_id', 'pk',
+        ):
+            latest[page_pk] = revision_pk
+        for page_pk, revision_pk in latest.items():
+            Page.objects.filter(
+                pk=page_pk,
+            ).update(
+                latest_revision=revision_pk,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0011_page_latest_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_latest_revision, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transcripts', '0012_fill_latest_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('watermark', models.CharField(max_length=64)),
+                ('status', models.CharField(default=b'queued', max_length=10, db_index=True, choices=[(b'queued', 'Queued'), (b'running', 'Running'), (b'done', 'Done'), (b'failed', 'Failed')])),
+                ('pages_done', models.PositiveIntegerField(default=0)),
+                ('pages_total', models.PositiveIntegerField(default=0)),
+                ('archive', models.CharField(max_length=255, blank=True)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(null=True, blank=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('finished', models.DateTimeField(null=True, blank=True)),
+                ('mission', models.ForeignKey(related_name='export_jobs', to='transcripts.Mission')),
+                ('requested_by', models.ForeignKey(related_name='export_jobs', on_delete=django.db.models.deletion.SET_NULL, blank=True, to=settings.AUTH_USER_MODEL, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import lib.media
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0013_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='screen',
+            field=lib.media.MigratableImageField(width_field=b'screen_width', height_field=b'screen_height', blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='screen_height',
+            field=models.IntegerField(default=0, null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='screen_width',
+            field=models.IntegerField(default=0, null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='thumbnail',
+            field=lib.media.MigratableImageField(width_field=b'thumbnail_width', height_field=b'thumbnail_height', blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='thumbnail_height',
+            field=models.IntegerField(default=0, null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='thumbnail_width',
+            field=models.IntegerField(default=0, null=True, editable=False, blank=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0014_page_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='tiles',
+            field=models.CharField(max_length=40, editable=False, blank=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0015_page_tiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mission',
+            name='pages_updated',
+            field=models.DateTimeField(null=True, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='original_hash',
+            field=models.CharField(db_index=True, max_length=40, editable=False, blank=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='original_text_hash',
+            field=models.CharField(db_index=True, max_length=40, editable=False, blank=True),
+        ),
+    ]
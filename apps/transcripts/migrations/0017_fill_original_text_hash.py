@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import hashlib
+
+
+CHUNK_SIZE = 1000
+
+
+def fill_original_text_hash(apps, schema_editor):
+    # Image hashes are filled in by the next import_pages instead, since
+    # that means reading every image back out of storage.
+    Page = apps.get_model('transcripts', 'Page')
+
+    last_pk = 0
+    while True:
+        pages = list(
+            Page.objects.filter(
+                pk__gt=last_pk,
+            ).order_by(
+                'pk',
+            ).values_list(
+                'pk', 'original_text',
+            )[:CHUNK_SIZE]
+        )
+        if len(pages) == 0:
+            break
+        last_pk = pages[-1][0]
+
+        for page_pk, original_text in pages:
+            Page.objects.filter(
+                pk=page_pk,
+            ).update(
+                original_text_hash=hashlib.sha1(
+                    original_text.encode('utf-8')
+                ).hexdigest(),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0016_page_hashes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_original_text_hash, migrations.RunPython.noop),
+    ]
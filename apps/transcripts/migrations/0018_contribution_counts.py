@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0017_fill_original_text_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contribution',
+            name='pages_approved',
+            field=models.IntegerField(default=0, help_text='Number of pages approved as correct.'),
+        ),
+        migrations.AddField(
+            model_name='contribution',
+            name='pages_cleaned',
+            field=models.IntegerField(default=0, help_text='Number of pages cleaned (with edits).'),
+        ),
+        migrations.AddField(
+            model_name='revision',
+            name='approval',
+            field=models.BooleanField(default=False, help_text='Did this approve the text as it was?'),
+        ),
+    ]
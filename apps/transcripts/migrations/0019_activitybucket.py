@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0018_contribution_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityBucket',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('period', models.CharField(max_length=4, choices=[(b'hour', 'Hour'), (b'day', 'Day')])),
+                ('start', models.DateTimeField()),
+                ('revisions', models.IntegerField(default=0)),
+                ('approvals', models.IntegerField(default=0)),
+                ('cleaners', models.IntegerField(default=0, help_text='Number of different people revising pages.')),
+                ('mission', models.ForeignKey(related_name='activity', to='transcripts.Mission')),
+            ],
+            options={
+                'ordering': ('mission', 'period', 'start'),
+            },
+        ),
+        migrations.CreateModel(
+            name='HighWaterMark',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(unique=True, max_length=50)),
+                ('mark', models.DateTimeField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='revision',
+            name='when',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='activitybucket',
+            unique_together=set([('mission', 'period', 'start')]),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+CHUNK_SIZE = 1000
+
+
+def fill_contribution_counts(apps, schema_editor):
+    # As the backfill_contributions command does.
+    Contribution = apps.get_model('transcripts', 'Contribution')
+    Page = apps.get_model('transcripts', 'Page')
+    Revision = apps.get_model('transcripts', 'Revision')
+
+    counts = {}
+    last_pk = 0
+    while True:
+        pages = list(
+            Page.objects.filter(
+                pk__gt=last_pk,
+            ).order_by(
+                'pk',
+            ).values_list(
+                'pk', 'mission_id', 'original_text',
+            )[:CHUNK_SIZE]
+        )
+        if len(pages) == 0:
+            break
+        last_pk = pages[-1][0]
+        missions = dict((pk, mission_id) for pk, mission_id, _ in pages)
+        texts = dict((pk, text) for pk, _, text in pages)
+
+        approvals = []
+        for pk, page_id, by_id, text in Revision.objects.filter(
+            page_id__in=texts.keys(),
+        ).order_by(
+            'page_id', 'when', 'pk',
+        ).values_list(
+            'pk', 'page_id', 'by_id', 'text',
+        ):
+            approved = text == texts[page_id]
+            texts[page_id] = text
+            if approved:
+                approvals.append(pk)
+            counts.setdefault(
+                (missions[page_id], by_id),
+                [ 0, 0 ],
+            )[approved] += 1
+        if approvals:
+            Revision.objects.filter(pk__in=approvals).update(approval=True)
+
+    for (mission_id, user_id), (cleaned, approved) in counts.items():
+        Contribution.objects.filter(
+            mission_id=mission_id,
+            user_id=user_id,
+        ).update(
+            pages_cleaned=cleaned,
+            pages_approved=approved,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transcripts', '0019_activitybucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_contribution_counts, migrations.RunPython.noop),
+    ]
@@ -1,22 +1,192 @@
+import hashlib
 import json
+import os.path
+import tempfile
+import threading
+import uuid
 from datetime import timedelta
-from django.db import models, transaction
-from django.db.models import Q, F
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.signals import request_finished
+from django.core.urlresolvers import reverse
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Count, F, Max, Min, Q, Sum, Value, When
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
 
-from apps.people.models import User
-from lib.media import core_media_filename, MigratableImageField
+from apps.people.models import (
+    LeaderboardEntry,
+    DecayedScore,
+    LEADERBOARD_SIZE,
+    User,
+)
+from lib.media import (
+    core_media_filename,
+    delete_directory,
+    jpeg_rendition,
+    MigratableImageField,
+    protected_storage,
+)
+from lib import deepzoom
+from lib.zipstream import ZipStream
+from .signals import revision_committed
+
+
+# How many candidates beyond those wanted the fallback claim tries
+# before giving up.
+CLAIM_ATTEMPTS = 5
+
+# Renditions of page scans, as (field, maximum width).
+RENDITIONS = (
+    ('screen', 1200),
+    ('thumbnail', 200),
+)
+
+# An export job that hasn't reported progress for this long is assumed
+# to have lost its worker, and is handed to another.
+EXPORT_JOB_STALE = timedelta(minutes=10)
+
+# Revisions newer than this may still be being committed, so activity
+# rollups leave them for next time.
+ACTIVITY_GRACE = timedelta(seconds=60)
+
+# Mission progress is projected from this many days' approvals.
+ETA_DAYS = 7
 
 
 class LockExpired(Exception):
     pass
 
 
+# Pages (in transcripts_page) that the user hasn't already revised,
+# according to their Contribution for the mission; takes the mission
+# and user ids as parameters. This saves an anti-join against every
+# revision on the mission. (The || '' makes PostgreSQL decompress the
+# bitmap once, rather than once per page.)
+NOT_REVISED_SQL = """
+    substr(
+        COALESCE((
+            SELECT revised_pages || '' FROM transcripts_contribution
+            WHERE mission_id = %s AND user_id = %s
+        ), ''),
+        transcripts_page.number + 1,
+        1
+    ) <> '1'
+"""
+
+
+def _supports_skip_locked(connection):
+    """Does this database support SELECT ... FOR UPDATE SKIP LOCKED?"""
+    return (
+        connection.vendor == 'postgresql' and
+        connection.pg_version >= 90500
+    )
+
+
+class MissionRegistry(object):
+    """
+    Every mission, kept in memory by each process so that looking one up
+    doesn't need a query; they only change a few times a year.
+
+    Saving or deleting a mission changes a version stamp in the cache,
+    which every process checks on each lookup, and reloads if it's
+    changed. In case that cache isn't shared between processes (as with
+    local memory), missions are also reloaded every MAX_AGE.
+
+    Missions are loaded on the first lookup rather than when a process
+    starts, so a worker can start (and serve errors) while the database
+    is down or not yet migrated, and recover once it's back.
+
+    If the change was made in a transaction (as the admin does), other
+    processes may reload before it commits, and keep the old missions
+    under the new stamp; so the stamp is changed again once the request
+    has finished. (Outside a request, such as in a management command,
+    they may be out of date until MAX_AGE.)
+    """
+    VERSION_KEY = 'mission-registry-version'
+    MAX_AGE = timedelta(minutes=5)
+
+    def __init__(self):
+        # (version, loaded at, missions by short name, current mission)
+        self._state = None
+        # per thread (or greenlet), so another request finishing first
+        # doesn't change the stamp before our transaction commits
+        self._pending = threading.local()
+
+    def load(self):
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(self.VERSION_KEY)
+        missions = list(Mission.objects.order_by('pk'))
+        active = [ mission for mission in missions if mission.active ]
+        self._state = (
+            version,
+            timezone.now(),
+            dict((mission.short_name, mission) for mission in missions),
+            active[0] if active else None,
+        )
+        return self._state
+
+    def invalidate(self):
+        cache.set(self.VERSION_KEY, uuid.uuid4().hex, None)
+        self._state = None
+        if transaction.get_connection().in_atomic_block:
+            self._pending.invalidate = True
+
+    def invalidate_if_pending(self):
+        """Call once any transaction that changed missions has committed."""
+        if getattr(self._pending, 'invalidate', False):
+            self._pending.invalidate = False
+            self.invalidate()
+
+    def _current_state(self):
+        state = self._state
+        if (
+            state is None or
+            state[0] != cache.get(self.VERSION_KEY) or
+            state[1] < timezone.now() - self.MAX_AGE
+        ):
+            state = self.load()
+        return state
+
+    def by_short_name(self, short_name):
+        return self._current_state()[2].get(short_name)
+
+    def current(self):
+        return self._current_state()[3]
+
+
+missions = MissionRegistry()
+
+
 class MissionManager(models.Manager):
 
     def current(self):
-        return Mission.objects.filter(active=True)[0]
+        """The active mission, from the registry (so usually no query)."""
+        mission = missions.current()
+        if mission is None:
+            raise IndexError("No active missions.")
+        return mission
+
+    def get_by_short_name(self, short_name):
+        """A mission by short name, from the registry (so usually no query)."""
+        mission = missions.by_short_name(short_name)
+        if mission is None:
+            raise Mission.DoesNotExist(
+                "No mission with short name %r." % short_name,
+            )
+        return mission
+
+    def load_registry(self):
+        missions.load()
 
 
 class Mission(models.Model):
@@ -56,97 +226,174 @@ class Mission(models.Model):
         blank=True,
         help_text=_('URL of wiki page for useful notes.'),
     )
+    lock_duration = models.PositiveIntegerField(
+        default=5,
+        help_text=_('Minutes someone can hold a page for while cleaning it.'),
+    )
+    # Set by import_pages when it adds or changes pages, so exports
+    # notice a re-import.
+    pages_updated = models.DateTimeField(null=True, blank=True, editable=False)
 
     objects = MissionManager()
 
-    def release_expired_locks(self):
-        self.pages.filter(
-            locked_by__isnull=False,
-            locked_until__lt=timezone.now()
-        ).update(
-            locked_by=None,
-            locked_until=None
-        )
-    
+    @property
+    def lock_period(self):
+        return timedelta(minutes=self.lock_duration)
+
+    def leaderboard(self):
+        """The Contributions of the people who've done most, best first."""
+        return self.contributions.filter(
+            Q(pages_cleaned__gt=0) | Q(pages_approved__gt=0),
+        ).annotate(
+            pages=F('pages_cleaned') + F('pages_approved'),
+        ).select_related(
+            'user',
+        ).order_by(
+            '-pages', 'user_id',
+        )[:LEADERBOARD_SIZE]
+
     def next_page_for_user(self, user):
-        # this is somewhat more conservative -- in terms of taking
-        # into account already-locked pages -- than we strictly need
-        # right now, but should clear up border cases well.
-
-        def _lock_pages_for_user(pages, user, n=1):
-            # this is a bit awkward; we have to convert from a QuerySet
-            # into a list then back into a QuerySet because we want to
-            # be able to pass QuerySets around (since they're nice) but
-            # we also need to restrict to a number of pages to operate
-            # on, which we can't do and subsequently run .update().
-            #
-            # This strictly means that between the time that we pull
-            # things from the database (in the [:n] slice) and the time
-            # that we run the update, the candidates may have changed
-            # beneath us. The Q(...) filters prevent us from locking
-            # pages we shouldn't, but it's possible that we'll miss out
-            # on a page we might otherwise have got.
-            #
-            # We could put the values_list()...update() block in a
-            # transaction, which would avoid this problem, but it does
-            # so at a concurrency cost.
-            page_pks = list(pages.values_list('pk', flat=True)[:n])
-            to_lock = Page.objects.filter(
-                pk__in=page_pks,
-            )
-            until = timezone.now() + timedelta(minutes=5)
-            updated = to_lock.filter(
-                approved=False
-            ).filter(
-                Q(locked_by__isnull=True) |
-                Q(locked_by=user) |
-                Q(locked_by__isnull=False, locked_until__lt=timezone.now())
-            ).update(
-                locked_by=user,
-                locked_until=until,
-            )
-            return to_lock.filter(
-                locked_by=user,
-                locked_until__gte=timezone.now(),
-            )
+        """
+        Claim the next page for this user to clean, and return it (or None).
 
-        prelocked_candidates = self.pages.filter(
+        This claims a lease of settings.PAGE_LEASE_SIZE pages at once;
+        see lease_pages_for_user().
+        """
+        pages = self.lease_pages_for_user(user, settings.PAGE_LEASE_SIZE)
+        if len(pages) > 0:
+            return pages[0]
+        return None
+
+    def lease_pages_for_user(self, user, n=1):
+        """
+        Claim up to n pages for this user to clean, returning them in
+        page order.
+
+        Pages already locked by this user come first (so reloading is
+        stable), then unlocked pages and pages whose lock has expired,
+        in page order. Approved pages and pages the user has already
+        revised are never claimed. The whole lease expires after n lock
+        durations, at which point anything unused is free for others.
+        """
+        now = timezone.now()
+        until = now + self.lock_period * n
+        connection = connections[router.db_for_write(Page)]
+        if _supports_skip_locked(connection):
+            pages = self._claim_pages_skip_locked(user, n, now, until)
+        else:
+            pages = self._claim_pages_conditional(user, n, now, until)
+        return sorted(pages, key=lambda page: page.number)
+
+    def leased_pages(self, user):
+        """Pages this user holds a live lock on, without claiming any."""
+        return self.pages.filter(
             locked_by=user,
+            locked_until__gte=timezone.now(),
             approved=False,
-        ).exclude(
-            revisions__by=user,
-        )
+        ).order_by('number')
 
-        locked_pages = _lock_pages_for_user(
-            prelocked_candidates,
-            user,
-            1
-        )
-        if len(locked_pages) > 0:
-            return locked_pages[0]
+    def _claim_pages_skip_locked(self, user, n, now, until):
+        # One round trip: pick the first eligible pages, skipping rows
+        # another transaction is busy claiming, and lock them to the user.
+        # Concurrent claimers therefore never queue up behind (or lose
+        # the race for) the same candidates.
+        #
+        # ARRAY() makes sure the candidates are picked exactly once. With
+        # IN, PostgreSQL may rescan the subquery for each row (say, when
+        # the table looks small), and a rescan skips rows this UPDATE
+        # has just changed, so some or all of the claim goes missing.
+        return list(Page.objects.raw(
+            """
+            UPDATE transcripts_page
+            SET locked_by_id = %s, locked_until = %s
+            WHERE id = ANY(ARRAY(
+                SELECT id FROM transcripts_page
+                WHERE mission_id = %s
+                AND approved = false
+                AND (
+                    locked_by_id IS NULL
+                    OR locked_by_id = %s
+                    OR locked_until < %s
+                )
+                AND """ + NOT_REVISED_SQL + """
+                ORDER BY
+                    CASE WHEN locked_by_id = %s THEN 0 ELSE 1 END,
+                    number
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ))
+            RETURNING *
+            """,
+            [
+                user.pk, until, self.pk, user.pk, now,
+                self.pk, user.pk,
+                user.pk, n,
+            ],
+        ))
 
-        self.release_expired_locks()
-        unlocked_candidates = self.pages.filter(
-            locked_by__isnull=True,
-            approved=False,
-        ).exclude(
-            revisions__by=user,
-        )
-        locked_pages = _lock_pages_for_user(
-            unlocked_candidates,
-            user,
-            1
+    def _claim_pages_conditional(self, user, n, now, until):
+        # For backends without SKIP LOCKED: find candidates, then claim
+        # each with an UPDATE guarded by the same conditions, so we can
+        # never steal a page that someone else claimed in between. If
+        # we lose that race we move on to the next candidate.
+        claimable = Q(approved=False) & (
+            Q(locked_by__isnull=True) |
+            Q(locked_by=user) |
+            Q(locked_until__lt=now)
         )
-        if len(locked_pages) > 0:
-            return locked_pages[0]
+        candidates = self.pages.filter(
+            claimable
+        ).extra(
+            where=[ NOT_REVISED_SQL ],
+            params=[ self.pk, user.pk ],
+        ).annotate(
+            mine=Case(
+                When(locked_by=user, then=Value(0)),
+                default=Value(1),
+                output_field=models.IntegerField(),
+            ),
+        ).order_by('mine', 'number')
 
-        return None
+        claimed = []
+        for pk in candidates.values_list('pk', flat=True)[:n + CLAIM_ATTEMPTS]:
+            updated = Page.objects.filter(
+                claimable,
+                pk=pk,
+            ).update(
+                locked_by=user,
+                locked_until=until,
+            )
+            if updated == 1:
+                claimed.append(pk)
+                if len(claimed) == n:
+                    break
+        return list(Page.objects.filter(pk__in=claimed))
 
     def approved_pages(self):
         return self.pages.filter(approved=True)
 
     def cleaned_pages(self):
         return self.pages.filter(revisions__id__isnull=False).distinct()
+
+    def eta(self, pages_left, now=None):
+        """
+        When the last of pages_left should be approved, going by the
+        last ETA_DAYS of activity; or None if nothing's been approved.
+        """
+        if now is None:
+            now = timezone.now()
+        since = _start_of_day(now) - timedelta(days=ETA_DAYS - 1)
+        approvals = ActivityBucket.objects.filter(
+            mission=self,
+            period=ActivityBucket.DAY,
+            start__gte=since,
+        ).aggregate(
+            approvals=Sum('approvals'),
+        )['approvals']
+        if not approvals:
+            return None
+        days = (now - since).total_seconds() / (24 * 60 * 60)
+        return now + timedelta(days=pages_left * days / approvals)
     
     def __unicode__(self):
         return self.name
@@ -155,6 +402,41 @@ class Mission(models.Model):
         ordering = ('start', )
 
 
+class PageManager(models.Manager):
+
+    def release_expired_locks(self, batch_size=1000, now=None):
+        """
+        Release up to batch_size expired locks, oldest first.
+
+        Returns a list of (roughly) how long each released lock had been
+        expired for, as timedeltas. Claiming already treats expired locks as free,
+        so this is just tidying up; run it regularly (see the
+        release_locks command) rather than in the request path.
+        """
+        if now is None:
+            now = timezone.now()
+        expired = list(
+            self.filter(
+                locked_until__lt=now,
+            ).order_by(
+                'locked_until',
+            ).values_list(
+                'pk', 'locked_until',
+            )[:batch_size]
+        )
+        if len(expired) == 0:
+            return []
+        # someone may have claimed one in the meantime, so check again
+        released = self.filter(
+            pk__in=[ pk for pk, until in expired ],
+            locked_until__lt=now,
+        ).update(
+            locked_by=None,
+            locked_until=None,
+        )
+        return [ now - until for pk, until in expired ][:released]
+
+
 class Page(models.Model):
     mission = models.ForeignKey(Mission, related_name='pages')
     number = models.PositiveIntegerField()
@@ -179,7 +461,72 @@ class Page(models.Model):
         null=True,
         editable=False
     )
+    # Scaled down JPEGs of the original, for cleaning with; see
+    # store_renditions().
+    screen = MigratableImageField(
+        height_field='screen_height',
+        width_field='screen_width',
+        upload_to=lambda i, f: core_media_filename(
+            'mission/page-screen',
+            i.mission.short_name,
+            f
+        ),
+        blank=True,
+        editable=False,
+    )
+    screen_width = models.IntegerField(
+        default=0,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    screen_height = models.IntegerField(
+        default=0,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    thumbnail = MigratableImageField(
+        height_field='thumbnail_height',
+        width_field='thumbnail_width',
+        upload_to=lambda i, f: core_media_filename(
+            'mission/page-thumbnail',
+            i.mission.short_name,
+            f
+        ),
+        blank=True,
+        editable=False,
+    )
+    thumbnail_width = models.IntegerField(
+        default=0,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    thumbnail_height = models.IntegerField(
+        default=0,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    # Names the deep zoom tiles in protected_storage (see store_tiles()),
+    # if they've been made.
+    tiles = models.CharField(max_length=40, blank=True, editable=False)
     original_text = models.TextField()
+    # SHA-1s of the imported image and text, so re-imports can skip
+    # pages that haven't changed.
+    original_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
+    original_text_hash = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
     approved = models.BooleanField(
         default=False,
         help_text=_('Is the latest revision approved?'),
@@ -191,17 +538,24 @@ class Page(models.Model):
         blank=True,
         null=True
     )
-    locked_until = models.DateTimeField(blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Kept up to date by create_revision(); select_related() it to get
+    # the current text without another query.
+    latest_revision = models.ForeignKey(
+        'Revision',
+        related_name='+',
+        blank=True,
+        null=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+    )
+
+    objects = PageManager()
 
     @property
     def text(self):
-        try:
-            rev = self.revisions.last()
-            if rev is not None:
-                return rev.text
-        except Revision.DoesNotExist:
-            pass
-        
+        if self.latest_revision_id is not None:
+            return self.latest_revision.text
         return self.original_text
 
     def create_revision(self, text, user):
@@ -210,29 +564,34 @@ class Page(models.Model):
             # in the interim (since we were working off a previous
             # revision or the original, we'd have been overwriting
             # their changes).
-            previous_text = self.text
+            approval = self.text == text
             revision = Revision.objects.create(
                 page = self,
                 text = text,
                 by = user,
+                approval = approval,
             )
             update = {}
+            now = timezone.now()
             # mark if the page is now approved
-            if previous_text == text:
+            if approval:
                 update['approved'] = True
                 User.objects.filter(
                     pk=user.pk,
                 ).update(
                     pages_approved=F('pages_approved')+1,
-                    score=F('score')+1,
+                    score=DecayedScore(now)+1,
+                    score_updated=now,
                 )
             else:
                 User.objects.filter(
                     pk=user.pk,
                 ).update(
                     pages_cleaned=F('pages_cleaned')+1,
-                    score=F('score')+1,
+                    score=DecayedScore(now)+1,
+                    score_updated=now,
                 )
+            LeaderboardEntry.objects.record(user.pk)
             # and unlock the page
             unlocked = Page.objects.filter(
                 mission = self.mission,
@@ -246,6 +605,122 @@ class Page(models.Model):
             )
             if unlocked != 1:
                 raise LockExpired(_("Lock expired before save."))
+            self.latest_revision = revision
+        # (Django 1.8 has no on_commit(), so if we're inside an outer
+        # transaction this is sent before that commits.)
+        revision_committed.send(sender=Revision, revision=revision)
+
+    def renew_lock(self, user):
+        """
+        Extend the user's lock on this page by the mission's lock duration.
+
+        Returns False if they no longer hold the lock. (As with saving, a
+        lock that has expired but not been taken by anyone else still
+        counts.)
+        """
+        until = timezone.now() + self.mission.lock_period
+        held = Page.objects.filter(
+            pk=self.pk,
+            locked_by=user,
+            approved=False,
+        )
+        # Don't cut short a longer lease.
+        renewed = held.filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=until),
+        ).update(
+            locked_until=until,
+        )
+        return renewed == 1 or held.exists()
+
+    @staticmethod
+    def store_renditions(mission, filename, f):
+        """
+        Make renditions (see RENDITIONS) of the page image in f, and
+        put them in storage. Returns the field values to set on the
+        page. Doesn't touch the database, so is safe to use from other
+        threads.
+        """
+        base = os.path.splitext(os.path.basename(filename))[0]
+        values = {}
+        for name, max_width in RENDITIONS:
+            f.seek(0)
+            content, (width, height) = jpeg_rendition(f, max_width)
+            field = Page._meta.get_field(name)
+            values[name] = field.storage.save(
+                field.generate_filename(Page(mission=mission), base + '.jpg'),
+                content,
+            )
+            values[name + '_width'] = width
+            values[name + '_height'] = height
+        return values
+
+    @staticmethod
+    def store_tiles(f):
+        """
+        Cut the page image in f into a deep zoom pyramid, and put it in
+        protected_storage under a name made from the image's content,
+        so the tiles never change once they're made. Returns the name,
+        for the page's tiles field. Doesn't touch the database.
+        """
+        f.seek(0)
+        content = f.read()
+        key = hashlib.sha1(content).hexdigest()
+        directory = "tiles/%s" % key
+        if protected_storage.exists("%s/page.dzi" % directory):
+            return key
+
+        image = Image.open(BytesIO(content))
+        for path, tile in deepzoom.tiles(image):
+            name = "%s/page_files/%s" % (directory, path)
+            if protected_storage.exists(name):
+                # made by an earlier run that didn't finish
+                protected_storage.delete(name)
+            protected_storage.save(name, ContentFile(tile))
+        # written last, so it only exists once the tiles are all there
+        protected_storage.save(
+            "%s/page.dzi" % directory,
+            ContentFile(deepzoom.descriptor(image.size).encode("utf-8")),
+        )
+        return key
+
+    @staticmethod
+    def delete_unused_images(names, keys):
+        """
+        Delete page images and renditions (by name) and tiles (by key)
+        that pages have stopped using, say once they've been replaced.
+        Any still used by a page are kept, since pages with the same
+        image share tiles.
+        """
+        names = set(name for name in names if name)
+        keys = set(key for key in keys if key)
+        if names:
+            for used in Page.objects.filter(
+                Q(original__in=names) |
+                Q(screen__in=names) |
+                Q(thumbnail__in=names),
+            ).values_list('original', 'screen', 'thumbnail'):
+                names.difference_update(used)
+        if keys:
+            keys.difference_update(
+                Page.objects.filter(
+                    tiles__in=keys,
+                ).values_list('tiles', flat=True)
+            )
+        # original, screen and thumbnail share a storage
+        storage = Page._meta.get_field('original').storage
+        for name in names:
+            storage.delete(name)
+        for key in keys:
+            delete_directory(protected_storage, "tiles/%s" % key)
+
+    def tiles_url(self):
+        return reverse(
+            'page-tiles',
+            kwargs={
+                'key': self.tiles,
+                'path': 'page.dzi',
+            },
+        )
 
     def is_locked(self):
         return (
@@ -267,7 +742,11 @@ class Revision(models.Model):
     page = models.ForeignKey(Page, related_name='revisions')
     text = models.TextField()
     by = models.ForeignKey('people.User', related_name='page_revisions')
-    when = models.DateTimeField(auto_now_add=True)
+    when = models.DateTimeField(auto_now_add=True, db_index=True)
+    approval = models.BooleanField(
+        default=False,
+        help_text=_('Did this approve the text as it was?'),
+    )
 
     def __unicode__(self):
         return _(u"p%(page)s of %(mission)s by %(by)s") % {
@@ -281,22 +760,353 @@ class Revision(models.Model):
         ordering = ('when',)
 
 
+@receiver(user_logged_out)
+def release_leases_on_logout(sender, request, user, **kwargs):
+    """Hand back any pages the user had locked but not cleaned."""
+    if user is None:
+        return
+    Page.objects.filter(
+        locked_by=user,
+        approved=False,
+    ).update(
+        locked_by=None,
+        locked_until=None,
+    )
+
+
+@receiver(post_save, sender=Mission)
+@receiver(post_delete, sender=Mission)
+def invalidate_missions(sender, instance, **kwargs):
+    missions.invalidate()
+
+
+@receiver(request_finished)
+def invalidate_missions_after_request(sender, **kwargs):
+    missions.invalidate_if_pending()
+
+
+@receiver(post_delete, sender=Revision)
+def update_latest_revision(sender, instance, **kwargs):
+    if instance.page_id in _deleting.pages():
+        # the page is going too
+        return
+    # Deleting the latest revision nulls Page.latest_revision; go back
+    # to whatever came before it.
+    Page.objects.filter(
+        pk=instance.page_id,
+        latest_revision__isnull=True,
+    ).update(
+        latest_revision=Revision.objects.filter(
+            page_id=instance.page_id,
+        ).last(),
+    )
+
+
+class Contribution(models.Model):
+    """What one person has done on one mission."""
+    mission = models.ForeignKey(Mission, related_name='contributions')
+    user = models.ForeignKey('people.User', related_name='contributions')
+    # One character per page number, '1' where they've revised that page
+    # (so we can skip them cheaply when picking the next page to clean).
+    revised_pages = models.TextField(default='', blank=True)
+    # Kept up to date as revisions are added and deleted, so we can see
+    # who's done most on a mission without counting their revisions.
+    pages_cleaned = models.IntegerField(
+        default=0,
+        help_text=_('Number of pages cleaned (with edits).'),
+    )
+    pages_approved = models.IntegerField(
+        default=0,
+        help_text=_('Number of pages approved as correct.'),
+    )
+
+    def mark_revised(self, number, revised=True):
+        pages = self.revised_pages.ljust(number + 1, '0')
+        self.revised_pages = (
+            pages[:number] + ('1' if revised else '0') + pages[number + 1:]
+        )
+
+    def has_revised(self, number):
+        return self.revised_pages[number:number + 1] == '1'
+
+    def count_revision(self, approval, by=1):
+        if approval:
+            self.pages_approved += by
+        else:
+            self.pages_cleaned += by
+
+    def __unicode__(self):
+        return _(u"%(user)s on %(mission)s") % {
+            'user': self.user.name,
+            'mission': self.mission.name,
+        }
+
+    class Meta:
+        unique_together = ('mission', 'user')
+
+
+@receiver(post_save, sender=Revision)
+def mark_page_revised(sender, instance, created, raw=False, **kwargs):
+    if created:
+        # However the revision was made (not just by create_revision(),
+        # but in the admin, fixtures or scripts), it's now the page's
+        # latest, unless it's been backdated behind that.
+        Page.objects.filter(
+            Q(latest_revision__isnull=True) |
+            Q(latest_revision__when__lte=instance.when),
+            pk=instance.page_id,
+        ).update(
+            latest_revision=instance,
+        )
+    if created and not raw:
+        mission_id, number = _page_position(instance)
+        with transaction.atomic():
+            contribution, _created = Contribution.objects.select_for_update(
+            ).get_or_create(
+                mission_id=mission_id,
+                user_id=instance.by_id,
+            )
+            contribution.mark_revised(number)
+            contribution.count_revision(instance.approval)
+            contribution.save(
+                update_fields=[
+                    'revised_pages',
+                    'pages_cleaned',
+                    'pages_approved',
+                ],
+            )
+
+
+@receiver(post_delete, sender=Revision)
+def unmark_page_revised(sender, instance, **kwargs):
+    deleting = _deleting.pages().get(instance.page_id)
+    if deleting is not None:
+        if deleting['contributions'] is None:
+            deleting['contributions'] = Contribution.objects.filter(
+                mission_id=deleting['mission_id'],
+            ).exists()
+        if not deleting['contributions']:
+            # the whole mission is going, contributions and all
+            return
+    mission_id, number = _page_position(instance)
+    with transaction.atomic():
+        contribution = Contribution.objects.select_for_update().filter(
+            mission_id=mission_id,
+            user_id=instance.by_id,
+        ).first()
+        if contribution is not None:
+            contribution.mark_revised(number, False)
+            contribution.count_revision(instance.approval, -1)
+            contribution.save(
+                update_fields=[
+                    'revised_pages',
+                    'pages_cleaned',
+                    'pages_approved',
+                ],
+            )
+
+
+class _Deleting(threading.local):
+    """
+    Pages being deleted, so that the post_delete receivers for each of
+    their revisions needn't look the page up again, and can skip
+    updating contributions that are going too; this makes deleting a
+    page or a mission a few queries per page rather than per revision.
+    """
+
+    def pages(self):
+        if not hasattr(self, '_pages'):
+            self._pages = {}
+        return self._pages
+
+    def clear(self):
+        self._pages = {}
+
+
+_deleting = _Deleting()
+
+
+def _page_position(revision):
+    # (mission id, number) of the revision's page, without loading
+    # the whole page if we don't already have it
+    deleting = _deleting.pages().get(revision.page_id)
+    if deleting is not None:
+        return deleting['mission_id'], deleting['number']
+    page = getattr(
+        revision,
+        Revision._meta.get_field('page').get_cache_name(),
+        None,
+    )
+    if page is not None:
+        return page.mission_id, page.number
+    return Page.objects.filter(
+        pk=revision.page_id,
+    ).values_list(
+        'mission_id', 'number',
+    ).get()
+
+
+@receiver(pre_delete, sender=Mission)
+def delete_contributions(sender, instance, **kwargs):
+    # They'd go anyway, but going first means the revisions' receivers
+    # can see they needn't update them.
+    instance.contributions.all().delete()
+
+
+@receiver(pre_delete, sender=Page)
+def remember_deleted_page(sender, instance, **kwargs):
+    _deleting.pages()[instance.pk] = {
+        'mission_id': instance.mission_id,
+        'number': instance.number,
+        # (checked after every pre_delete has been sent)
+        'contributions': None,
+    }
+
+
+@receiver(post_delete, sender=Page)
+def forget_deleted_page(sender, instance, **kwargs):
+    _deleting.pages().pop(instance.pk, None)
+
+
+@receiver(request_finished)
+def forget_deleted_pages(sender, **kwargs):
+    # in case a delete failed (and was rolled back) part way through
+    _deleting.clear()
+
+
 class MissionExporter(object):
     """Exports a mission so it can be used in Spacelog"""
 
-    def __init__(self, mission, main_transcript_name="TEC"):
+    # Pages to fetch from the database at once.
+    CHUNK_SIZE = 1000
+
+    def __init__(self, mission, main_transcript_name="TEC", progress=None,
+                 since=None):
         self.mission = mission
         self.main_transcript_name = main_transcript_name
+        # called with the number of pages done so far, after each chunk
+        self.progress = progress
+        # If set (to a revision id, or a datetime), only export pages
+        # whose latest revision is newer; see cursor().
+        self.since = since
 
     def main_transcript(self):
         """Returns the text of the mission's main transcript"""
-        main_transcript = ""
-        for page in self.mission.pages.all():
-            main_transcript += "\tPage %d\n" % page.number
-            main_transcript += "\tApproved? %s\n" % page.approved
-            main_transcript += page.text
-            main_transcript += "\n"
-        return main_transcript
+        return u"".join(self.main_transcript_chunks())
+
+    def main_transcript_chunks(self):
+        """Yields the text of the mission's main transcript, in chunks"""
+        for pages in self._page_chunks():
+            yield self._main_transcript_text(pages)
+
+    def write_main_transcript_and_manifest(self, transcript, manifest,
+                                           cursor):
+        """
+        Writes the main transcript and its _manifest to the file objects
+        transcript and manifest, as UTF-8. Both come from the same read
+        of each page, so the manifest's SHA-1s always match the text in
+        the transcript.
+        """
+        pages = []
+        for chunk in self._page_chunks():
+            transcript.write(
+                self._main_transcript_text(chunk).encode("utf-8"),
+            )
+            pages.extend(
+                {
+                    "number": number,
+                    "approved": approved,
+                    "sha1": hashlib.sha1(text.encode("utf-8")).hexdigest(),
+                }
+                for number, approved, text in chunk
+            )
+        manifest.write(self._manifest(pages, cursor).encode("utf-8"))
+
+    def cursor(self):
+        """
+        Returns the id of the latest revision exported, to pass as since
+        next time. (Revision ids are global, so this works across
+        missions.) Get this before exporting, so nothing is missed.
+
+        Ids are handed out when a revision is inserted, not when it's
+        committed, so a revision still being saved when this is called
+        can have a lower id than the cursor yet only appear afterwards;
+        the next export since the cursor will miss it. Saving a revision
+        takes milliseconds, so this is rare, but if it matters export
+        since a slightly earlier cursor: pages exported twice are simply
+        replaced.
+        """
+        return Revision.objects.aggregate(cursor=Max('id'))['cursor'] or 0
+
+    def _main_transcript_text(self, pages):
+        return u"".join(
+            u"\tPage %d\n\tApproved? %s\n%s\n" % (
+                number,
+                approved,
+                text,
+            )
+            for number, approved, text in pages
+        )
+
+    def _manifest(self, pages, cursor):
+        # The JSON of the export's _manifest: each exported page's
+        # number, and SHA-1 of its text, with the new cursor.
+        since = self.since
+        if hasattr(since, 'isoformat'):
+            since = since.isoformat()
+        manifest = {
+            "name": self.mission.short_name.lower(),
+            "since": since,
+            "cursor": cursor,
+            "pages": pages,
+        }
+        return json.dumps(manifest, indent=4) + "\n"
+
+    def manifest_path(self):
+        """Returns the path where the manifest should be written,
+        relative to the mission's root directory."""
+        return "transcripts/_manifest"
+
+    def _page_chunks(self):
+        # Pages come a chunk at a time, each chunk one query (joining in
+        # the latest revision), so memory stays bounded however long the
+        # mission is.
+        pages = self.mission.pages.all()
+        if hasattr(self.since, 'tzinfo'):
+            pages = pages.filter(latest_revision__when__gt=self.since)
+        elif self.since is not None:
+            pages = pages.filter(latest_revision__gt=self.since)
+        last_number = -1
+        done = 0
+        while True:
+            chunk = list(
+                pages.filter(
+                    number__gt=last_number,
+                ).order_by(
+                    'number',
+                ).values_list(
+                    'number',
+                    'approved',
+                    'original_text',
+                    'latest_revision__text',
+                )[:self.CHUNK_SIZE]
+            )
+            if len(chunk) == 0:
+                break
+            last_number = chunk[-1][0]
+            yield [
+                (
+                    number,
+                    approved,
+                    original_text if text is None else text,
+                )
+                for number, approved, original_text, text in chunk
+            ]
+            done += len(chunk)
+            if self.progress is not None:
+                self.progress(done)
+            if len(chunk) < self.CHUNK_SIZE:
+                break
 
     def main_transcript_path(self):
         """Returns the path where the main transcript should be written,
@@ -329,11 +1139,468 @@ class MissionExporter(object):
         relative to the mission's root directory."""
         return "transcripts/_meta"
 
+    def watermark(self):
+        """
+        Returns a key that changes whenever the export would: when a
+        revision is added or removed, a page added or re-imported, or the
+        mission renamed. Two queries, on columns kept up to date as pages
+        are revised, so this doesn't have to read any revisions.
+        """
+        stats = self.mission.pages.aggregate(
+            pages=Count('id'),
+            last_page=Max('id'),
+            last_revision=Max('latest_revision'),
+        )
+        stats.update(self.mission.contributions.aggregate(
+            cleaned=Sum('pages_cleaned'),
+            approved=Sum('pages_approved'),
+        ))
+        key = u"|".join(
+            unicode(value) for value in (
+                self.mission.name,
+                self.mission.short_name,
+                self.mission.start.isoformat(),
+                self.mission.pages_updated,
+                self.main_transcript_name,
+                stats['pages'],
+                stats['last_page'],
+                stats['last_revision'],
+                stats['cleaned'],
+                stats['approved'],
+            )
+        )
+        return "%s-%s" % (
+            stats['last_revision'] or 0,
+            hashlib.sha1(key.encode("utf-8")).hexdigest()[:12],
+        )
+
+    def zip_chunks(self):
+        """Yields a zip of the transcript and _meta, as byte strings"""
+        short_name = self.mission.short_name
+        zip_stream = ZipStream()
+        for chunk in zip_stream.entry(
+            "%s/%s" % (short_name, self.main_transcript_path()),
+            (
+                chunk.encode("utf-8")
+                for chunk in self.main_transcript_chunks()
+            ),
+        ):
+            yield chunk
+        for chunk in zip_stream.entry(
+            "%s/%s" % (short_name, self.meta_path()),
+            [ self.meta().encode("utf-8") ],
+        ):
+            yield chunk
+        for chunk in zip_stream.close():
+            yield chunk
+
+    def cached_main_transcript_and_manifest(self):
+        """
+        Returns the protected_storage paths of the main transcript and
+        its _manifest, generating them if there's been a revision since
+        they were last generated.
+
+        Both are written from one read of the pages; the cursor is taken
+        before that, so a revision made while they're being generated is
+        after it, and will be in the next export --since.
+        """
+        cursor = self.cursor()
+        watermark = self.watermark()
+        directory = self._cache_directory()
+        transcript_path = "%s/%s/%s" % (
+            directory,
+            watermark,
+            self.main_transcript_name,
+        )
+        manifest_path = "%s/%s/_manifest" % (directory, watermark)
+        if not (
+            protected_storage.exists(transcript_path) and
+            protected_storage.exists(manifest_path)
+        ):
+            with tempfile.TemporaryFile() as transcript:
+                with tempfile.TemporaryFile() as manifest:
+                    self.write_main_transcript_and_manifest(
+                        transcript,
+                        manifest,
+                        cursor,
+                    )
+                    self._save(transcript_path, transcript)
+                    self._save(manifest_path, manifest)
+        return transcript_path, manifest_path
+
+    def cached_meta(self):
+        """Returns the protected_storage path of the _meta file,
+        generating it if needed."""
+        return self._cached(
+            "_meta",
+            lambda: [ self.meta().encode("utf-8") ],
+        )
+
+    def cached_zip(self, generate=True, watermark=None):
+        """Returns the protected_storage path of the zip, generating it
+        if needed (or returning None if it's needed and generate is
+        False). Pass watermark if you already have it."""
+        return self._cached(
+            "%s.zip" % self.mission.short_name,
+            self.zip_chunks,
+            generate,
+            watermark,
+        )
+
+    def _cached(self, filename, chunks, generate=True, watermark=None):
+        # only whole exports are cached
+        assert self.since is None
+        directory = self._cache_directory()
+        if watermark is None:
+            watermark = self.watermark()
+        path = "%s/%s/%s" % (directory, watermark, filename)
+        if protected_storage.exists(path):
+            return path
+        if not generate:
+            return None
+
+        with tempfile.TemporaryFile() as f:
+            for chunk in chunks():
+                f.write(chunk)
+            self._save(path, f)
+        return path
+
+    def _save(self, path, f):
+        f.seek(0)
+        saved = protected_storage.save(path, File(f))
+        if saved != path:
+            # someone else got there first; theirs is just as good
+            protected_storage.delete(saved)
+
+    def prune_cache(self, watermark):
+        """
+        Deletes cached exports from before watermark, which won't be
+        wanted again.
+
+        Only those whose latest revision is older are deleted: a slow
+        export under an older watermark mustn't delete a newer one that
+        someone is downloading. This is left to export_worker, rather
+        than done whenever something is cached, for the same reason.
+        """
+        directory = self._cache_directory()
+        if not protected_storage.exists(directory):
+            return
+        latest_revision = _watermark_revision(watermark)
+        for old in protected_storage.listdir(directory)[0]:
+            if _watermark_revision(old) < latest_revision:
+                old_directory = "%s/%s" % (directory, old)
+                for name in protected_storage.listdir(old_directory)[1]:
+                    protected_storage.delete(
+                        "%s/%s" % (old_directory, name),
+                    )
+
+    def _cache_directory(self):
+        return "exports/%s" % self.mission.short_name
+
     def _cleaners(self):
-        cleaners = set()
-        for page in self.mission.pages.all():
-            for revision in page.revisions.all():
-                cleaners.add(revision.by.name)
-        cleaners = list(cleaners)
-        cleaners.sort()
-        return cleaners
+        return sorted(
+            self.mission.contributions.filter(
+                Q(pages_cleaned__gt=0) | Q(pages_approved__gt=0),
+            ).values_list(
+                'user__name',
+                flat=True,
+            ).distinct()
+        )
+
+
+def _watermark_revision(watermark):
+    # the latest revision id a watermark was made from
+    return int(watermark.split("-", 1)[0])
+
+
+class ExportJobManager(models.Manager):
+
+    def enqueue(self, mission, user, watermark):
+        """
+        Returns a job exporting the mission as of watermark, queueing one
+        unless it's already queued or running.
+        """
+        job = self.filter(
+            mission=mission,
+            watermark=watermark,
+            status__in=(ExportJob.QUEUED, ExportJob.RUNNING),
+        ).order_by('created').first()
+        if job is not None:
+            return job
+        return self.create(
+            mission=mission,
+            requested_by=user,
+            watermark=watermark,
+        )
+
+    def claim(self):
+        """
+        Claim the oldest queued job (or one whose worker has gone away)
+        for this worker, marking it as running. Returns None if there
+        isn't one.
+        """
+        now = timezone.now()
+        stale = now - EXPORT_JOB_STALE
+        connection = connections[router.db_for_write(ExportJob)]
+        if _supports_skip_locked(connection):
+            # Other workers skip past the job while we're claiming it.
+            # (See Mission._claim_pages_skip_locked() for why ARRAY().)
+            jobs = list(self.raw(
+                """
+                UPDATE transcripts_exportjob
+                SET status = %s, started = %s, updated = %s
+                WHERE id = ANY(ARRAY(
+                    SELECT id FROM transcripts_exportjob
+                    WHERE status = %s
+                    OR (status = %s AND updated < %s)
+                    ORDER BY created
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                ))
+                RETURNING *
+                """,
+                [
+                    ExportJob.RUNNING, now, now,
+                    ExportJob.QUEUED,
+                    ExportJob.RUNNING, stale,
+                ],
+            ))
+            return jobs[0] if jobs else None
+
+        waiting = Q(status=ExportJob.QUEUED) | Q(
+            status=ExportJob.RUNNING,
+            updated__lt=stale,
+        )
+        for job in self.filter(waiting).order_by('created')[:CLAIM_ATTEMPTS]:
+            # only ours if no other worker got there first
+            claimed = self.filter(waiting, pk=job.pk).update(
+                status=ExportJob.RUNNING,
+                started=now,
+                updated=now,
+            )
+            if claimed == 1:
+                return self.get(pk=job.pk)
+        return None
+
+
+class ExportJob(models.Model):
+    """
+    A mission export, queued by the export view and run by the
+    export_worker command, so big missions don't tie up a web worker.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, _('Queued')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    )
+
+    mission = models.ForeignKey(Mission, related_name='export_jobs')
+    requested_by = models.ForeignKey(
+        'people.User',
+        related_name='export_jobs',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    # the mission's MissionExporter.watermark() when it was queued
+    watermark = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        db_index=True,
+    )
+    pages_done = models.PositiveIntegerField(default=0)
+    pages_total = models.PositiveIntegerField(default=0)
+    # path of the zip in protected_storage, once done
+    archive = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(auto_now=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    objects = ExportJobManager()
+
+    def __unicode__(self):
+        return _(u"Export of %(mission)s (%(status)s)") % {
+            'mission': self.mission.name,
+            'status': self.get_status_display(),
+        }
+
+    @property
+    def is_finished(self):
+        return self.status in (ExportJob.DONE, ExportJob.FAILED)
+
+    @property
+    def percent_done(self):
+        if self.pages_total == 0:
+            return 100 if self.status == ExportJob.DONE else 0
+        return 100 * self.pages_done // self.pages_total
+
+    def run(self):
+        """Export the mission into protected_storage, reporting progress
+        as we go. Call once the job has been claimed."""
+        self.pages_total = self.mission.pages.count()
+        self.pages_done = 0
+        self.save(update_fields=['pages_total', 'pages_done', 'updated'])
+        exporter = MissionExporter(self.mission, progress=self.report_progress)
+        try:
+            watermark = exporter.watermark()
+            self.archive = exporter.cached_zip(watermark=watermark)
+            exporter.prune_cache(watermark)
+        except Exception as e:
+            self.status = ExportJob.FAILED
+            self.error = u"%s: %s" % (e.__class__.__name__, e)
+            raise
+        else:
+            self.status = ExportJob.DONE
+            # nothing to report if it was already cached
+            self.pages_done = self.pages_total
+        finally:
+            self.finished = timezone.now()
+            self.save()
+
+    def report_progress(self, pages_done):
+        self.pages_done = pages_done
+        ExportJob.objects.filter(pk=self.pk).update(
+            pages_done=pages_done,
+            updated=timezone.now(),
+        )
+
+
+class HighWaterMark(models.Model):
+    """How far an incremental job (named) has got."""
+    name = models.CharField(max_length=50, unique=True)
+    mark = models.DateTimeField()
+
+    def __unicode__(self):
+        return u"%s: %s" % (self.name, self.mark.isoformat())
+
+
+def _start_of_hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def _start_of_day(when):
+    return _start_of_hour(when).replace(hour=0)
+
+
+class ActivityBucketManager(models.Manager):
+
+    def roll_up(self, now=None, grace=ACTIVITY_GRACE):
+        """
+        Bring the hourly and daily buckets up to date with revisions
+        made before now - grace, a day at a time from where we got to
+        last time; returns the number of days rolled up.
+
+        Distinct cleaners don't add up, so each day's buckets are worked
+        out again from the start of the day (from revisions found by
+        their index on when), rather than added to.
+        """
+        if now is None:
+            now = timezone.now()
+        until = now - grace
+        mark, _created = HighWaterMark.objects.get_or_create(
+            name='activity',
+            defaults={
+                'mark': (
+                    Revision.objects.aggregate(first=Min('when'))['first']
+                    or until
+                ),
+            },
+        )
+        days = 0
+        start = _start_of_day(mark.mark)
+        while start < until:
+            end = min(start + timedelta(days=1), until)
+            with transaction.atomic():
+                self._roll_up_day(start, end)
+                mark.mark = end
+                mark.save(update_fields=['mark'])
+            days += 1
+            start += timedelta(days=1)
+        return days
+
+    def _roll_up_day(self, start, end):
+        counts = {}
+        for mission_id, when, approval, by_id in Revision.objects.filter(
+            when__gte=start,
+            when__lt=end,
+        ).values_list(
+            'page__mission_id', 'when', 'approval', 'by_id',
+        ):
+            for period, bucket_start in (
+                (ActivityBucket.HOUR, _start_of_hour(when)),
+                (ActivityBucket.DAY, start),
+            ):
+                bucket = counts.setdefault(
+                    (mission_id, period, bucket_start),
+                    [ 0, 0, set() ],
+                )
+                bucket[0] += 1
+                bucket[1] += 1 if approval else 0
+                bucket[2].add(by_id)
+
+        self.filter(start__gte=start, start__lt=end).delete()
+        self.bulk_create(
+            ActivityBucket(
+                mission_id=mission_id,
+                period=period,
+                start=bucket_start,
+                revisions=revisions,
+                approvals=approvals,
+                cleaners=len(cleaners),
+            )
+            for (mission_id, period, bucket_start), (
+                revisions, approvals, cleaners
+            ) in counts.items()
+        )
+
+
+class ActivityBucket(models.Model):
+    """
+    What happened on a mission in an hour or a day; kept up to date by
+    the roll_up_activity command.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIODS = (
+        (HOUR, _('Hour')),
+        (DAY, _('Day')),
+    )
+
+    mission = models.ForeignKey(Mission, related_name='activity')
+    period = models.CharField(max_length=4, choices=PERIODS)
+    start = models.DateTimeField()
+    revisions = models.IntegerField(default=0)
+    approvals = models.IntegerField(default=0)
+    cleaners = models.IntegerField(
+        default=0,
+        help_text=_('Number of different people revising pages.'),
+    )
+
+    objects = ActivityBucketManager()
+
+    @property
+    def approval_rate(self):
+        if self.revisions == 0:
+            return 0
+        return 100 * self.approvals // self.revisions
+
+    def __unicode__(self):
+        return _(u"%(mission)s %(period)s from %(start)s") % {
+            'mission': self.mission.name,
+            'period': self.get_period_display(),
+            'start': self.start.isoformat(),
+        }
+
+    class Meta:
+        unique_together = ('mission', 'period', 'start')
+        ordering = ('mission', 'period', 'start')
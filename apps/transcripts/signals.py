@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent (with sender Revision) after Page.create_revision() has saved a
+# revision and updated the page and its cleaner's counts to match.
+revision_committed = Signal(providing_args=['revision'])
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from django_webtest import WebTest
+from django.test.utils import override_settings
+from StringIO import StringIO
+import os.path
+
+from .factories import *
+from .models import ActivityBucket, HighWaterMark, Revision
+
+
+# a little after 10am
+NOW = datetime(2016, 8, 15, 10, 30, tzinfo=timezone.utc)
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class Activity(WebTest):
+
+    def setUp(self):
+        self.mission = MissionFactory(short_name='MA7')
+        self.pages = PageFactory.create_batch(4, mission=self.mission)
+        self.users = UserFactory.create_batch(2)
+
+    def _revise(self, page, user, when, approval=False):
+        revision = Revision.objects.create(
+            page=page,
+            text=u"Cleaned.",
+            by=user,
+            approval=approval,
+        )
+        # when is set on create, so move it afterwards
+        Revision.objects.filter(pk=revision.pk).update(when=when)
+
+    def _buckets(self, period):
+        return [
+            (bucket.start, bucket.revisions, bucket.approvals, bucket.cleaners)
+            for bucket in ActivityBucket.objects.filter(period=period)
+        ]
+
+    def test_roll_up(self):
+        """Revisions are counted by hour and day, carrying on each time."""
+        self._revise(self.pages[0], self.users[0], NOW - timedelta(hours=2))
+        self._revise(
+            self.pages[1],
+            self.users[0],
+            NOW - timedelta(hours=1, minutes=50),
+            approval=True,
+        )
+        self._revise(self.pages[0], self.users[1], NOW - timedelta(minutes=5))
+        # still within the grace period
+        self._revise(self.pages[2], self.users[1], NOW - timedelta(seconds=10))
+
+        self.assertEqual(1, ActivityBucket.objects.roll_up(now=NOW))
+        hour = NOW.replace(minute=0)
+        self.assertEqual(
+            [
+                (hour - timedelta(hours=2), 2, 1, 1),
+                (hour, 1, 0, 1),
+            ],
+            self._buckets(ActivityBucket.HOUR),
+        )
+        self.assertEqual(
+            [ (hour.replace(hour=0), 3, 1, 2) ],
+            self._buckets(ActivityBucket.DAY),
+        )
+        self.assertEqual(
+            NOW - timedelta(seconds=60),
+            HighWaterMark.objects.get(name='activity').mark,
+        )
+
+        ActivityBucket.objects.roll_up(now=NOW + timedelta(minutes=5))
+        self.assertEqual(
+            [
+                (hour - timedelta(hours=2), 2, 1, 1),
+                (hour, 2, 0, 1),
+            ],
+            self._buckets(ActivityBucket.HOUR),
+        )
+        self.assertEqual(
+            [ (hour.replace(hour=0), 4, 1, 2) ],
+            self._buckets(ActivityBucket.DAY),
+        )
+
+    def test_eta(self):
+        """Completion is projected from the last week's approvals."""
+        self.assertIsNone(self.mission.eta(4, now=NOW))
+
+        # one approval a day
+        for day in range(7):
+            ActivityBucket.objects.create(
+                mission=self.mission,
+                period=ActivityBucket.DAY,
+                start=NOW.replace(hour=0, minute=0) - timedelta(days=day),
+                revisions=1,
+                approvals=1,
+                cleaners=1,
+            )
+        eta = self.mission.eta(4, now=NOW)
+        self.assertTrue(NOW + timedelta(days=3) < eta < NOW + timedelta(days=4))
+
+    def test_stats(self):
+        self._revise(
+            self.pages[0],
+            self.users[0],
+            timezone.now() - timedelta(hours=1),
+            approval=True,
+        )
+        self.pages[0].approved = True
+        self.pages[0].save()
+        call_command('roll_up_activity', stdout=StringIO())
+
+        resp = self.app.get(
+            reverse('mission-stats', kwargs={ 'slug': 'MA7' }),
+        )
+        resp.mustcontain(
+            u"1 out of 4 pages approved.",
+            u"we should finish around",
+        )
+        self.assertEqual(2, len(resp.html.select('.activity tbody tr')))
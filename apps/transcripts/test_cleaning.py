@@ -256,3 +256,153 @@ class Clean(WebTest):
         )
         self.assertEqual(302, resp.status_int)
         self.assertEqual("http://localhost:80" + reverse("homepage"), resp.headers['location'])
+
+    @override_settings(PAGE_LEASE_SIZE=2)
+    def test_lease(self):
+        """With a lease, saving goes straight on to the next leased page."""
+
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+
+        resp = self.app.get(
+            reverse(
+                "mission-clean-next",
+                kwargs={ 'slug': mission.short_name }
+            ),
+            user=user.email,
+        )
+        resp = resp.follow()
+        form = resp.forms['clean']
+        form.set('text', 'A totally different bit of text.')
+        resp = form.submit()
+        self.assertEqual(302, resp.status_int)
+        self.assertEqual(
+            "http://localhost:80" + reverse(
+                "mission-page",
+                kwargs={
+                    'slug': mission.short_name,
+                    'page': pages[1].number,
+                }
+            ),
+            resp.headers['location'],
+        )
+        resp = resp.follow()
+        form = resp.forms['clean']
+        resp = form.submit()
+        # lease used up, so claim again
+        self.assertEqual(
+            "http://localhost:80" + reverse(
+                "mission-clean-next",
+                kwargs={ 'slug': mission.short_name }
+            ),
+            resp.headers['location'],
+        )
+
+    def test_screen_rendition(self):
+        """Pages show the screen rendition, linking to the original."""
+
+        mission = MissionFactory()
+        page = PageFactory(
+            mission=mission,
+            screen="dummy-patch.png",
+            screen_width=120,
+            screen_height=145,
+        )
+        user = UserFactory()
+
+        resp = self.app.get(
+            reverse(
+                "mission-page",
+                kwargs={
+                    'slug': mission.short_name,
+                    'page': page.number,
+                }
+            ),
+            user=user.email,
+        )
+        img = resp.html.find(id='original').find('img')
+        self.assertEqual(page.screen.url, img['src'])
+        self.assertEqual(page.original.url, img.parent['href'])
+
+    @override_settings(PAGE_LEASE_SIZE=2)
+    def test_logout_releases_lease(self):
+        """Logging out hands back any leased pages."""
+
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+
+        self.app.get(
+            reverse(
+                "mission-clean-next",
+                kwargs={ 'slug': mission.short_name }
+            ),
+            user=user.email,
+        )
+        self.assertEqual(2, Page.objects.filter(locked_by=user).count())
+        resp = self.app.get(reverse("logout"), user=user.email)
+        resp.forms['logout-form'].submit()
+        self.assertEqual(0, Page.objects.filter(locked_by=user).count())
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class RenewLock(WebTest):
+    """Test keeping hold of a page while cleaning it."""
+
+    csrf_checks = False
+
+    def test_renew(self):
+        """Renewing pushes back the lock expiry."""
+
+        mission = MissionFactory(lock_duration=10)
+        pages = PageFactory.create_batch(1, mission=mission)
+        user = UserFactory()
+
+        page = mission.next_page_for_user(user)
+        Page.objects.filter(pk=page.pk).update(
+            locked_until=timezone.now() + timedelta(minutes=1),
+        )
+        resp = self.app.post(
+            reverse(
+                "mission-page-renew",
+                kwargs={
+                    'slug': mission.short_name,
+                    'page': page.number,
+                }
+            ),
+            user=user.email,
+        )
+        self.assertEqual(204, resp.status_int)
+        self.assertTrue(
+            Page.objects.get(pk=page.pk).locked_until >
+            timezone.now() + timedelta(minutes=9)
+        )
+
+    def test_renew_lost(self):
+        """Renewing a lock someone else has taken is a conflict."""
+
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(1, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        page = mission.next_page_for_user(users[0])
+        Page.objects.filter(pk=page.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1),
+        )
+        mission.next_page_for_user(users[1])
+        resp = self.app.post(
+            reverse(
+                "mission-page-renew",
+                kwargs={
+                    'slug': mission.short_name,
+                    'page': page.number,
+                }
+            ),
+            user=users[0].email,
+            expect_errors=True,
+        )
+        self.assertEqual(409, resp.status_int)
+        self.assertEqual(users[1].pk, Page.objects.get(pk=page.pk).locked_by_id)
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from django_webtest import WebTest
+from StringIO import StringIO
+from urlparse import urlparse
+from zipfile import ZipFile
+import hashlib
+import json
+import os.path
+import re
+import shutil
+import tempfile
+
+from .factories import *
+from .models import ExportJob, Mission, MissionExporter
+from .testing import ThrowawayMediaMixin
+from lib.media import protected_storage
+
+
+class Export(ThrowawayMediaMixin, WebTest):
+    """Test exporting missions for Spacelog."""
+
+    def _clean(self, mission, user, text):
+        page = mission.next_page_for_user(user)
+        page.create_revision(text, user)
+        return page
+
+    def test_main_transcript(self):
+        """The transcript has every page's latest text, in order."""
+
+        mission = MissionFactory(name="Mercury-Atlas 7", short_name="MA7")
+        pages = PageFactory.create_batch(3, mission=mission)
+        users = UserFactory.create_batch(2)
+        self._clean(mission, users[0], u"Cleaned – once.")
+        self._clean(mission, users[1], u"Cleaned – once.")
+
+        exporter = MissionExporter(mission)
+        self.assertEqual(
+            u"\tPage %i\n\tApproved? True\nCleaned – once.\n"
+            u"\tPage %i\n\tApproved? False\n%s\n"
+            u"\tPage %i\n\tApproved? False\n%s\n" % (
+                pages[0].number,
+                pages[1].number,
+                pages[1].original_text,
+                pages[2].number,
+                pages[2].original_text,
+            ),
+            exporter.main_transcript(),
+        )
+        meta = json.loads(exporter.meta())
+        self.assertEqual(
+            [ users[0].name, users[1].name ],
+            meta['copy']['cleaners'],
+        )
+
+    def test_query_count(self):
+        """Exporting takes the same number of queries for more pages."""
+
+        user = UserFactory()
+        for n_pages in (3, 30):
+            mission = MissionFactory(name="Mercury-Atlas 7")
+            PageFactory.create_batch(n_pages, mission=mission)
+            for i in range(n_pages // 3):
+                self._clean(mission, user, u"Cleaned.")
+
+            exporter = MissionExporter(mission)
+            with self.assertNumQueries(2):
+                exporter.main_transcript()
+                exporter.meta()
+
+    def test_zip(self):
+        """The export view queues a job, then serves its zip."""
+
+        mission = MissionFactory(name="Mercury-Atlas 7", short_name="MA7")
+        PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+        self._clean(mission, user, u"Cleaned – once.")
+
+        export_url = reverse(
+            "mission-export",
+            kwargs={ 'slug': mission.short_name },
+        )
+        resp = self.app.get(export_url, user=user.email)
+        self.assertEqual(302, resp.status_int)
+        job = ExportJob.objects.get()
+        self.assertEqual(
+            reverse(
+                "mission-export-job",
+                kwargs={ 'slug': mission.short_name, 'job': job.pk },
+            ),
+            urlparse(resp['Location']).path,
+        )
+        resp = resp.follow(user=user.email)
+        self.assertContains(resp, "Waiting for the export to start.")
+
+        call_command('export_worker', once=True, verbosity=0)
+        job = ExportJob.objects.get()
+        self.assertEqual(ExportJob.DONE, job.status)
+        self.assertEqual((3, 3), (job.pages_done, job.pages_total))
+
+        resp = self.app.get(resp.request.path, user=user.email)
+        download_url = reverse(
+            "mission-export-download",
+            kwargs={ 'slug': mission.short_name, 'job': job.pk },
+        )
+        self.assertContains(resp, download_url)
+        resp = self.app.get(download_url, user=user.email)
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(
+            'attachment; filename=MA7.zip',
+            resp.headers['Content-Disposition'],
+        )
+
+        exporter = MissionExporter(Mission.objects.get(pk=mission.pk))
+        zip_file = ZipFile(StringIO(resp.body))
+        self.assertIsNone(zip_file.testzip())
+        self.assertEqual(
+            [ 'MA7/transcripts/TEC', 'MA7/transcripts/_meta' ],
+            zip_file.namelist(),
+        )
+        self.assertEqual(
+            exporter.main_transcript(),
+            zip_file.read('MA7/transcripts/TEC').decode('utf-8'),
+        )
+        self.assertEqual(
+            exporter.meta(),
+            zip_file.read('MA7/transcripts/_meta').decode('utf-8'),
+        )
+
+        # now it's been exported, it's served directly
+        resp = self.app.get(export_url, user=user.email)
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(1, ExportJob.objects.count())
+
+    def test_jobs(self):
+        """Jobs are queued once per watermark, and claimed once."""
+
+        mission = MissionFactory()
+        PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+        watermark = MissionExporter(mission).watermark()
+        job = ExportJob.objects.enqueue(mission, user, watermark)
+        self.assertEqual(
+            job,
+            ExportJob.objects.enqueue(mission, UserFactory(), watermark),
+        )
+
+        self.assertEqual(job, ExportJob.objects.claim())
+        self.assertIsNone(ExportJob.objects.claim())
+        self.assertEqual(
+            ExportJob.RUNNING,
+            ExportJob.objects.get(pk=job.pk).status,
+        )
+
+        # a job whose worker has gone quiet is given to another
+        ExportJob.objects.filter(pk=job.pk).update(
+            updated=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(job, ExportJob.objects.claim())
+
+    def test_progress(self):
+        """Jobs report pages done as each chunk is exported."""
+
+        mission = MissionFactory()
+        PageFactory.create_batch(5, mission=mission)
+        job = ExportJob.objects.enqueue(
+            mission,
+            None,
+            MissionExporter(mission).watermark(),
+        )
+        job = ExportJob.objects.claim()
+
+        reported = []
+        def report_progress(pages_done):
+            reported.append(pages_done)
+            ExportJob.report_progress(job, pages_done)
+        job.report_progress = report_progress
+        self.addCleanup(
+            setattr,
+            MissionExporter,
+            'CHUNK_SIZE',
+            MissionExporter.CHUNK_SIZE,
+        )
+        MissionExporter.CHUNK_SIZE = 2
+        job.run()
+        self.assertEqual([ 2, 4, 5 ], reported)
+        self.assertEqual(100, job.percent_done)
+        self.assertTrue(protected_storage.exists(job.archive))
+
+    def test_cached(self):
+        """Exports are reused until there's another revision."""
+
+        mission = MissionFactory(name="Mercury-Atlas 7", short_name="MA7")
+        PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+        self._clean(mission, user, u"Cleaned.")
+
+        exporter = MissionExporter(mission)
+        path = exporter.cached_zip()
+        self.assertTrue(protected_storage.exists(path))
+        with self.assertNumQueries(2):
+            self.assertEqual(path, exporter.cached_zip())
+
+        old_watermark = exporter.watermark()
+        self._clean(mission, UserFactory(), u"Cleaned again.")
+        new_path = exporter.cached_zip()
+        self.assertNotEqual(path, new_path)
+        self.assertTrue(protected_storage.exists(path))
+
+        # pruning from an older export leaves newer ones alone
+        exporter.prune_cache(old_watermark)
+        self.assertTrue(protected_storage.exists(path))
+        self.assertTrue(protected_storage.exists(new_path))
+        exporter.prune_cache(exporter.watermark())
+        self.assertFalse(protected_storage.exists(path))
+        self.assertTrue(protected_storage.exists(new_path))
+        zip_file = ZipFile(protected_storage.open(new_path))
+        self.assertIn(
+            u"Cleaned again.",
+            zip_file.read('MA7/transcripts/TEC').decode('utf-8'),
+        )
+
+    def test_watermark(self):
+        """The watermark changes when revisions come and go."""
+
+        mission = MissionFactory()
+        PageFactory.create_batch(2, mission=mission)
+        user = UserFactory()
+        exporter = MissionExporter(mission)
+        watermarks = [ exporter.watermark() ]
+        page = self._clean(mission, user, u"Cleaned.")
+        watermarks.append(exporter.watermark())
+        self._clean(mission, UserFactory(), u"Cleaned again.")
+        watermarks.append(exporter.watermark())
+        page.revisions.all().delete()
+        watermarks.append(exporter.watermark())
+        self.assertEqual(4, len(set(watermarks)))
+
+    def test_command(self):
+        """The export command writes the transcript and _meta."""
+
+        mission = MissionFactory(name="Mercury-Atlas 7", short_name="MA7")
+        PageFactory.create_batch(3, mission=mission)
+        self._clean(mission, UserFactory(), u"Cleaned – once.")
+
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        call_command('export', 'MA7', export_dir)
+
+        exporter = MissionExporter(Mission.objects.get(pk=mission.pk))
+        with open(os.path.join(export_dir, 'transcripts/TEC')) as f:
+            self.assertEqual(
+                exporter.main_transcript(),
+                f.read().decode('utf-8'),
+            )
+        with open(os.path.join(export_dir, 'transcripts/_meta')) as f:
+            self.assertEqual(exporter.meta(), f.read().decode('utf-8'))
+
+    def test_command_many(self):
+        """The export command can export several missions at once."""
+
+        missions = [
+            MissionFactory(name="Mercury-Atlas %i" % i, short_name="MA%i" % i)
+            for i in (6, 7, 8)
+        ]
+        for mission in missions:
+            PageFactory.create_batch(2, mission=mission)
+
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        call_command(
+            'export',
+            export_dir,
+            missions='MA6,MA7',
+            processes=1,
+            stdout=StringIO(),
+        )
+        self.assertEqual([ 'ma6', 'ma7' ], sorted(os.listdir(export_dir)))
+        for mission in missions[:2]:
+            exporter = MissionExporter(Mission.objects.get(pk=mission.pk))
+            path = os.path.join(
+                export_dir,
+                mission.short_name.lower(),
+                'transcripts/TEC',
+            )
+            with open(path) as f:
+                self.assertEqual(
+                    exporter.main_transcript(),
+                    f.read().decode('utf-8'),
+                )
+
+    def test_cursor_before_transcript(self):
+        """A page cleaned while the transcript is being exported is in
+        the next export since its cursor, and not in this one's
+        _manifest either."""
+
+        mission = MissionFactory(name="Mercury-Atlas 7", short_name="MA7")
+        pages = PageFactory.create_batch(2, mission=mission)
+        user = UserFactory()
+        self._clean(mission, user, u"Cleaned – once.")
+
+        page_chunks = MissionExporter.__dict__['_page_chunks']
+        self.addCleanup(
+            setattr,
+            MissionExporter,
+            '_page_chunks',
+            page_chunks,
+        )
+        def clean_while_exporting(exporter):
+            for chunk in page_chunks(exporter):
+                yield chunk
+            MissionExporter._page_chunks = page_chunks
+            self._clean(mission, user, u"Cleaned – late.")
+        MissionExporter._page_chunks = clean_while_exporting
+
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        call_command('export', 'MA7', export_dir)
+        with open(os.path.join(export_dir, 'transcripts/TEC')) as f:
+            transcript = f.read().decode('utf-8')
+        self.assertNotIn(u"late", transcript)
+        with open(os.path.join(export_dir, 'transcripts/_manifest')) as f:
+            manifest = json.load(f)
+        texts = re.findall(
+            r"\tPage \d+\n\tApproved\? \w+\n(.*?)\n(?=\tPage |$)",
+            transcript,
+            re.S,
+        )
+        self.assertEqual(
+            [ page['sha1'] for page in manifest['pages'] ],
+            [
+                hashlib.sha1(text.encode("utf-8")).hexdigest()
+                for text in texts
+            ],
+        )
+
+        call_command('export', 'MA7', export_dir, since=str(manifest['cursor']))
+        with open(os.path.join(export_dir, 'transcripts/TEC')) as f:
+            self.assertEqual(
+                u"\tPage %i\n\tApproved? False\nCleaned – late.\n" % (
+                    pages[1].number,
+                ),
+                f.read().decode('utf-8'),
+            )
+
+    def test_since(self):
+        """Exports since a cursor only have pages cleaned after it."""
+
+        mission = MissionFactory(name="Mercury-Atlas 7", short_name="MA7")
+        pages = PageFactory.create_batch(3, mission=mission)
+        self._clean(mission, UserFactory(), u"Cleaned – once.")
+
+        export_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_dir)
+        call_command('export', 'MA7', export_dir)
+        with open(os.path.join(export_dir, 'transcripts/_manifest')) as f:
+            manifest = json.load(f)
+        self.assertIsNone(manifest['since'])
+        self.assertEqual(
+            [ page.number for page in pages ],
+            [ page['number'] for page in manifest['pages'] ],
+        )
+
+        user = UserFactory()
+        self._clean(mission, user, u"Cleaned – once.")
+        page = self._clean(mission, user, u"Cleaned – twice.")
+        call_command('export', 'MA7', export_dir, since=str(manifest['cursor']))
+
+        with open(os.path.join(export_dir, 'transcripts/TEC')) as f:
+            self.assertEqual(
+                u"\tPage %i\n\tApproved? True\nCleaned – once.\n"
+                u"\tPage %i\n\tApproved? False\nCleaned – twice.\n" % (
+                    pages[0].number,
+                    pages[1].number,
+                ),
+                f.read().decode('utf-8'),
+            )
+        with open(os.path.join(export_dir, 'transcripts/_manifest')) as f:
+            delta = json.load(f)
+        self.assertEqual(manifest['cursor'], delta['since'])
+        self.assertEqual(page.latest_revision.pk, delta['cursor'])
+        self.assertEqual(
+            [
+                {
+                    "number": pages[0].number,
+                    "approved": True,
+                    "sha1": hashlib.sha1(
+                        u"Cleaned – once.".encode("utf-8"),
+                    ).hexdigest(),
+                },
+                {
+                    "number": pages[1].number,
+                    "approved": False,
+                    "sha1": hashlib.sha1(
+                        u"Cleaned – twice.".encode("utf-8"),
+                    ).hexdigest(),
+                },
+            ],
+            delta['pages'],
+        )
@@ -0,0 +1,322 @@
+from django.conf import settings
+from django.core.files.images import get_image_dimensions
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from StringIO import StringIO
+import os.path
+import shutil
+import tarfile
+import tempfile
+import zipfile
+
+from .factories import *
+from .models import Page
+from .testing import ThrowawayMediaMixin
+from lib.media import protected_storage
+
+
+DUMMY_ORIGINAL = os.path.join(
+    settings.BASE_DIR,
+    'apps/transcripts/test_media/dummy-original.png',
+)
+
+
+class ImportPages(ThrowawayMediaMixin, TestCase):
+    """Test importing page images and text."""
+
+    def setUp(self):
+        super(ImportPages, self).setUp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.png_dir = os.path.join(self.source, 'png')
+        self.text_dir = os.path.join(self.source, 'text')
+        os.mkdir(self.png_dir)
+        os.mkdir(self.text_dir)
+        for number in range(1, 6):
+            # remember PNGs are 0-indexed
+            shutil.copy(
+                DUMMY_ORIGINAL,
+                os.path.join(self.png_dir, 'page-%03i.png' % (number - 1)),
+            )
+            with open(
+                os.path.join(self.text_dir, 'page-%03i.txt' % number),
+                'w',
+            ) as f:
+                f.write('Page %i caf\xe9.' % number)
+
+        self.mission = MissionFactory(short_name='MA7')
+
+    def _import(self, *args, **options):
+        options.setdefault('batch_size', 2)
+        options.setdefault('workers', 2)
+        # renditions are slow, so only make them when testing them
+        options.setdefault('renditions', False)
+        call_command(
+            'import_pages',
+            'MA7',
+            self.png_dir,
+            self.text_dir,
+            *args,
+            stdout=StringIO(),
+            **options
+        )
+
+    def test_import(self):
+        """Every page is imported, with its image measured."""
+
+        self._import(renditions=True)
+        pages = list(Page.objects.filter(mission=self.mission))
+        self.assertEqual([ 1, 2, 3, 4, 5 ], [ page.number for page in pages ])
+        for page in pages:
+            self.assertEqual(u"Page %i caf\xe9." % page.number, page.original_text)
+            self.assertEqual(
+                (2521, 3054),
+                (page.original_width, page.original_height),
+            )
+            self.assertTrue(page.original.storage.exists(page.original.name))
+            self.assertEqual(
+                (1200, 1454),
+                (page.screen_width, page.screen_height),
+            )
+            self.assertEqual(
+                (200, 242),
+                (page.thumbnail_width, page.thumbnail_height),
+            )
+            self.assertEqual(
+                (1200, 1454),
+                get_image_dimensions(page.screen),
+            )
+
+    def test_make_renditions(self):
+        """Renditions can be made for pages imported without them."""
+
+        self._import()
+        self.assertEqual(
+            5,
+            Page.objects.filter(mission=self.mission, screen='').count(),
+        )
+
+        call_command('make_renditions', 'MA7', stdout=StringIO())
+        for page in Page.objects.filter(mission=self.mission):
+            self.assertEqual(
+                (200, 242),
+                get_image_dimensions(page.thumbnail),
+            )
+
+        # remade, the ones they replace are deleted
+        page = Page.objects.get(mission=self.mission, number=1)
+        call_command('make_renditions', 'MA7', all=True, stdout=StringIO())
+        remade = Page.objects.get(pk=page.pk)
+        for name in ('screen', 'thumbnail'):
+            old = getattr(page, name)
+            self.assertNotEqual(old.name, getattr(remade, name).name)
+            self.assertFalse(old.storage.exists(old.name))
+            self.assertTrue(old.storage.exists(getattr(remade, name).name))
+
+    def test_resume(self):
+        """An import stopped by a bad file can be resumed."""
+
+        with open(os.path.join(self.png_dir, 'page-003.png'), 'w') as f:
+            f.write('not a PNG')
+        with self.assertRaises(CommandError):
+            self._import()
+        # the batch with the bad file isn't committed, but earlier ones are
+        self.assertEqual(
+            [ 1, 2 ],
+            list(
+                Page.objects.filter(
+                    mission=self.mission,
+                ).values_list('number', flat=True)
+            ),
+        )
+
+        shutil.copy(DUMMY_ORIGINAL, os.path.join(self.png_dir, 'page-003.png'))
+        self._import(resume=True)
+        self.assertEqual(
+            [ 1, 2, 3, 4, 5 ],
+            list(
+                Page.objects.filter(
+                    mission=self.mission,
+                ).values_list('number', flat=True)
+            ),
+        )
+
+    def test_reimport(self):
+        """Re-importing only stores and updates what has changed."""
+
+        self._import()
+        originals = dict(
+            Page.objects.filter(
+                mission=self.mission,
+            ).values_list('number', 'original')
+        )
+        self.mission.refresh_from_db()
+        pages_updated = self.mission.pages_updated
+
+        # nothing changed
+        self._import()
+        self.assertEqual(
+            originals,
+            dict(
+                Page.objects.filter(
+                    mission=self.mission,
+                ).values_list('number', 'original')
+            ),
+        )
+        self.mission.refresh_from_db()
+        self.assertEqual(pages_updated, self.mission.pages_updated)
+
+        # re-OCRed page 2, and a new scan of page 4
+        with open(os.path.join(self.text_dir, 'page-002.txt'), 'w') as f:
+            f.write('Page 2 cafe.')
+        with open(os.path.join(self.png_dir, 'page-003.png'), 'ab') as f:
+            f.write('\0')
+        self._import()
+        pages = dict(
+            (page.number, page)
+            for page in Page.objects.filter(mission=self.mission)
+        )
+        self.assertEqual(u"Page 2 cafe.", pages[2].original_text)
+        self.assertEqual(originals[2], pages[2].original.name)
+        self.assertEqual(u"Page 4 caf\xe9.", pages[4].original_text)
+        self.assertNotEqual(originals[4], pages[4].original.name)
+        for number in (1, 3, 5):
+            self.assertEqual(originals[number], pages[number].original.name)
+        self.mission.refresh_from_db()
+        self.assertNotEqual(pages_updated, self.mission.pages_updated)
+
+    def test_reimport_deletes(self):
+        """A re-imported image's old files and unshared tiles are deleted."""
+
+        self._import(renditions=True)
+        call_command('make_tiles', 'MA7', processes=1, stdout=StringIO())
+        pages = Page.objects.filter(mission=self.mission)
+        old = pages.get(number=4)
+        key = old.tiles
+        self.assertTrue(protected_storage.exists("tiles/%s/page.dzi" % key))
+
+        # a new scan of page 4; the others still use its tiles
+        with open(os.path.join(self.png_dir, 'page-003.png'), 'ab') as f:
+            f.write('\0')
+        self._import(renditions=True)
+        new = pages.get(number=4)
+        for name in ('original', 'screen', 'thumbnail'):
+            self.assertNotEqual(
+                getattr(old, name).name,
+                getattr(new, name).name,
+            )
+            self.assertFalse(
+                old.original.storage.exists(getattr(old, name).name)
+            )
+            self.assertTrue(
+                new.original.storage.exists(getattr(new, name).name)
+            )
+        self.assertEqual('', new.tiles)
+        self.assertTrue(protected_storage.exists("tiles/%s/page.dzi" % key))
+
+        # once nothing uses them, they go too
+        pages.exclude(number=5).update(tiles='')
+        with open(os.path.join(self.png_dir, 'page-004.png'), 'ab') as f:
+            f.write('\0')
+        self._import()
+        self.assertFalse(
+            os.path.exists(protected_storage.path("tiles/%s" % key))
+        )
+
+    def _archive_pages(self):
+        # all the text first, then all the images, in a directory
+        numbers = range(1, 6)
+        return [
+            (
+                os.path.join(self.text_dir, 'page-%03i.txt' % number),
+                'MA7/text/page-%03i.txt' % number,
+            )
+            for number in numbers
+        ] + [
+            (
+                os.path.join(self.png_dir, 'page-%03i.png' % (number - 1)),
+                'MA7/png/page-%03i.png' % (number - 1),
+            )
+            for number in numbers
+        ]
+
+    def test_zip(self):
+        """Pages can be imported from a zip file."""
+
+        path = os.path.join(self.source, 'pages.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for filename, name in self._archive_pages():
+                archive.write(filename, name)
+
+        self._import_archive(path)
+
+    def test_tar(self):
+        """Pages can be imported from a compressed tar file."""
+
+        path = os.path.join(self.source, 'pages.tar.gz')
+        archive = tarfile.open(path, 'w:gz')
+        for filename, name in self._archive_pages():
+            archive.add(filename, name)
+        archive.close()
+
+        self._import_archive(path)
+
+    def test_unmatched(self):
+        """Images with no text in an archive aren't left in storage."""
+
+        path = os.path.join(self.source, 'pages.zip')
+        with zipfile.ZipFile(path, 'w') as archive:
+            for filename, name in self._archive_pages():
+                archive.write(filename, name)
+            # page 6 has no text
+            archive.write(DUMMY_ORIGINAL, 'MA7/png/page-005.png')
+
+        stderr = StringIO()
+        call_command(
+            'import_pages',
+            'MA7',
+            archive=path,
+            workers=2,
+            stdout=StringIO(),
+            stderr=stderr,
+        )
+        self.assertIn(u"Page 6 has no text", stderr.getvalue())
+        self.assertEqual(5, Page.objects.filter(mission=self.mission).count())
+        stored = [
+            filename
+            for directory, dirnames, filenames in os.walk(settings.MEDIA_ROOT)
+            for filename in filenames
+        ]
+        self.assertTrue(
+            any(filename.endswith('-page-004.png') for filename in stored)
+        )
+        self.assertEqual(
+            [],
+            [ filename for filename in stored if '-page-005.' in filename ],
+        )
+
+    def _import_archive(self, path):
+        PageFactory(mission=self.mission, number=2)
+        call_command(
+            'import_pages',
+            'MA7',
+            archive=path,
+            resume=True,
+            batch_size=2,
+            workers=2,
+            renditions=False,
+            stdout=StringIO(),
+        )
+        pages = list(Page.objects.filter(mission=self.mission))
+        self.assertEqual([ 1, 2, 3, 4, 5 ], [ page.number for page in pages ])
+        for page in pages:
+            if page.number == 2:
+                # was already there
+                continue
+            self.assertEqual(u"Page %i caf\xe9." % page.number, page.original_text)
+            self.assertEqual(
+                (2521, 3054),
+                (page.original_width, page.original_height),
+            )
+            self.assertTrue(page.original.storage.exists(page.original.name))
@@ -0,0 +1,102 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+from django_webtest import WebTest
+from importlib import import_module
+from StringIO import StringIO
+import os.path
+
+from .factories import *
+from .models import Contribution, Revision
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class MissionLeaderboard(WebTest):
+
+    def setUp(self):
+        self.mission = MissionFactory(short_name='MA7')
+        self.pages = PageFactory.create_batch(3, mission=self.mission)
+        self.users = UserFactory.create_batch(2)
+
+    def _clean(self, user, text=None):
+        page = self.mission.next_page_for_user(user)
+        page.create_revision(text or page.text, user)
+        return page
+
+    def _counts(self):
+        return dict(
+            (user_id, (cleaned, approved))
+            for user_id, cleaned, approved in Contribution.objects.filter(
+                mission=self.mission,
+            ).values_list('user_id', 'pages_cleaned', 'pages_approved')
+        )
+
+    def test_counts(self):
+        """Cleaning and approving pages is counted per mission."""
+        self._clean(self.users[0], u"Cleaned.")
+        self._clean(self.users[0])
+        self._clean(self.users[1], u"Cleaned again.")
+        self.assertEqual(
+            {
+                self.users[0].pk: (1, 1),
+                self.users[1].pk: (1, 0),
+            },
+            self._counts(),
+        )
+
+        Revision.objects.filter(by=self.users[0], approval=True).delete()
+        self.assertEqual((1, 0), self._counts()[self.users[0].pk])
+
+    def test_backfill(self):
+        """The counts can be worked out again from revisions."""
+        self._clean(self.users[0], u"Cleaned.")
+        self._clean(self.users[0])
+        self._clean(self.users[1], u"Cleaned again.")
+        counts = self._counts()
+        Revision.objects.update(approval=False)
+        Contribution.objects.update(pages_cleaned=0, pages_approved=0)
+
+        call_command(
+            'backfill_contributions',
+            chunk_size=2,
+            stdout=StringIO(),
+        )
+        self.assertEqual(counts, self._counts())
+        self.assertEqual(1, Revision.objects.filter(approval=True).count())
+
+    def test_migration(self):
+        """Counts for revisions from before we counted are filled in."""
+        self._clean(self.users[0], u"Cleaned.")
+        self._clean(self.users[0])
+        self._clean(self.users[1], u"Cleaned again.")
+        counts = self._counts()
+        Revision.objects.update(approval=False)
+        Contribution.objects.update(pages_cleaned=0, pages_approved=0)
+
+        migration = import_module(
+            'apps.transcripts.migrations.0020_fill_contribution_counts',
+        )
+        migration.fill_contribution_counts(apps, None)
+        self.assertEqual(counts, self._counts())
+        self.assertEqual(1, Revision.objects.filter(approval=True).count())
+
+    def test_view(self):
+        """The leaderboard shows who has done most, best first."""
+        self._clean(self.users[1], u"Cleaned.")
+        self._clean(self.users[1], u"Cleaned.")
+        self._clean(self.users[0], u"Cleaned again.")
+
+        resp = self.app.get(
+            reverse('mission-leaderboard', kwargs={ 'slug': 'MA7' }),
+        )
+        self.assertEqual(
+            [
+                u"%s: 2 cleaned, 0 approved." % self.users[1].name,
+                u"%s: 1 cleaned, 0 approved." % self.users[0].name,
+            ],
+            [ li.text for li in resp.html.select('.leaderboard li') ],
+        )
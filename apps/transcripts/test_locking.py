@@ -1,11 +1,14 @@
 from datetime import timedelta
 from django.conf import settings
-from django.test import TestCase
-from django.test.utils import override_settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils import timezone
+from unittest import skipUnless
 import os.path
+import threading
 
-from .models import Page
+from .models import Contribution, Page, Revision, _supports_skip_locked
 from .factories import *
 
 
@@ -120,3 +123,315 @@ class NextPage(TestCase):
         page2 = mission.next_page_for_user(users[1])
         self.assertIsNotNone(page1)
         self.assertIsNone(page2)
+
+    def test_skips_revised(self):
+        """next_page_for_user() won't hand back a page the user has revised"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(2, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        Revision.objects.create(page=pages[0], text=u"Cleaned.", by=users[0])
+
+        page = mission.next_page_for_user(users[0])
+        self.assertIsNotNone(page)
+        self.assertEqual(pages[1].pk, page.pk)
+
+    def test_prefers_own_lock(self):
+        """next_page_for_user() returns a page the user holds before others"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(3, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        Page.objects.filter(pk=pages[2].pk).update(
+            locked_by=users[0],
+            locked_until=timezone.now() + timedelta(minutes=1),
+        )
+
+        page = mission.next_page_for_user(users[0])
+        self.assertIsNotNone(page)
+        self.assertEqual(pages[2].pk, page.pk)
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+@skipUnless(
+    _supports_skip_locked(connection),
+    "Concurrent claims need a database with SKIP LOCKED.",
+)
+class ConcurrentNextPage(TransactionTestCase):
+
+    USERS = 50
+
+    def test_no_double_claims(self):
+        """Concurrent next_page_for_user() calls never claim the same page"""
+        mission = MissionFactory()
+        PageFactory.create_batch(self.USERS * 2, mission=mission)
+        users = UserFactory.create_batch(self.USERS)
+
+        claimed = {}
+        start = threading.Event()
+
+        def claim(user):
+            try:
+                start.wait()
+                page = mission.next_page_for_user(user)
+                claimed[user.pk] = page.pk if page is not None else None
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=claim, args=(user,)) for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.USERS, len(claimed))
+        self.assertNotIn(None, claimed.values())
+        self.assertEqual(self.USERS, len(set(claimed.values())))
+        self.assertEqual(
+            self.USERS,
+            Page.objects.filter(locked_by__isnull=False).count(),
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class Leases(TestCase):
+
+    def test_lease(self):
+        """lease_pages_for_user() locks several pages at once, in order"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(5, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        lease1 = mission.lease_pages_for_user(users[0], 3)
+        lease2 = mission.lease_pages_for_user(users[1], 3)
+
+        self.assertEqual(
+            [ page.pk for page in pages[:3] ],
+            [ page.pk for page in lease1 ],
+        )
+        self.assertEqual(
+            [ page.pk for page in pages[3:] ],
+            [ page.pk for page in lease2 ],
+        )
+        self.assertEqual(
+            3,
+            Page.objects.filter(locked_by=users[0]).count(),
+        )
+
+    def test_leased_pages(self):
+        """leased_pages() lists live locks without claiming anything"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+
+        self.assertEqual(0, mission.leased_pages(user).count())
+        mission.lease_pages_for_user(user, 2)
+        Page.objects.filter(pk=pages[0].pk).update(approved=True)
+        self.assertEqual(
+            [ pages[1].pk ],
+            [ page.pk for page in mission.leased_pages(user) ],
+        )
+
+    @override_settings(PAGE_LEASE_SIZE=2)
+    def test_next_page_leases(self):
+        """next_page_for_user() claims a whole lease"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(3, mission=mission)
+        user = UserFactory()
+
+        page = mission.next_page_for_user(user)
+        self.assertEqual(pages[0].pk, page.pk)
+        self.assertEqual(2, mission.leased_pages(user).count())
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class ReleaseLocks(TestCase):
+
+    def test_releases_expired(self):
+        """release_expired_locks() only touches expired locks, in batches"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(4, mission=mission)
+        user = UserFactory()
+
+        now = timezone.now()
+        Page.objects.filter(pk__in=[ pages[0].pk, pages[1].pk, pages[2].pk ]).update(
+            locked_by=user,
+            locked_until=now - timedelta(minutes=1),
+        )
+        Page.objects.filter(pk=pages[3].pk).update(
+            locked_by=user,
+            locked_until=now + timedelta(minutes=1),
+        )
+
+        released = Page.objects.release_expired_locks(batch_size=2, now=now)
+        self.assertEqual(2, len(released))
+        self.assertEqual(timedelta(minutes=1), released[0])
+        released = Page.objects.release_expired_locks(batch_size=2, now=now)
+        self.assertEqual(1, len(released))
+        released = Page.objects.release_expired_locks(batch_size=2, now=now)
+        self.assertEqual(0, len(released))
+
+        self.assertEqual(
+            [ pages[3].pk ],
+            list(
+                Page.objects.filter(
+                    locked_by__isnull=False,
+                ).values_list('pk', flat=True)
+            ),
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class RevisedPages(TestCase):
+
+    def test_create_revision(self):
+        """create_revision() marks the page as revised by that user"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(2, mission=mission)
+        user = UserFactory()
+
+        page = mission.next_page_for_user(user)
+        page.create_revision(u"Cleaned.", user)
+
+        contribution = Contribution.objects.get(mission=mission, user=user)
+        self.assertTrue(contribution.has_revised(pages[0].number))
+        self.assertFalse(contribution.has_revised(pages[1].number))
+
+    def test_delete_revision(self):
+        """Deleting a revision makes the page available to its author again"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(1, mission=mission)
+        user = UserFactory()
+
+        revision = Revision.objects.create(
+            page=pages[0],
+            text=u"Cleaned.",
+            by=user,
+        )
+        self.assertIsNone(mission.next_page_for_user(user))
+        revision.delete()
+        page = mission.next_page_for_user(user)
+        self.assertIsNotNone(page)
+        self.assertEqual(pages[0].pk, page.pk)
+
+    def test_delete_mission(self):
+        """Deleting a mission takes its contributions with it"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(1, mission=mission)
+        user = UserFactory()
+        Revision.objects.create(page=pages[0], text=u"Cleaned.", by=user)
+
+        mission.delete()
+        self.assertEqual(0, Contribution.objects.count())
+
+    def test_delete_page(self):
+        """Deleting a page unmarks it for everyone who revised it"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(2, mission=mission)
+        users = UserFactory.create_batch(2)
+        for user in users:
+            for page in pages:
+                Revision.objects.create(page=page, text=u"Cleaned.", by=user)
+
+        pages[0].delete()
+        for contribution in Contribution.objects.all():
+            self.assertFalse(contribution.has_revised(pages[0].number))
+            self.assertTrue(contribution.has_revised(pages[1].number))
+            self.assertEqual(1, contribution.pages_cleaned)
+
+    def test_delete_mission_queries(self):
+        """Deleting a mission doesn't cost queries for each revision"""
+        queries = []
+        for n_users in (1, 5):
+            mission = MissionFactory()
+            pages = PageFactory.create_batch(2, mission=mission)
+            for user in UserFactory.create_batch(n_users):
+                for page in pages:
+                    Revision.objects.create(
+                        page=page,
+                        text=u"Cleaned.",
+                        by=user,
+                    )
+            with CaptureQueriesContext(connection) as context:
+                mission.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class CurrentText(TestCase):
+
+    def test_text(self):
+        """A page's text is its latest revision, read without a query"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(1, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        self.assertEqual(pages[0].original_text, pages[0].text)
+        for user, text in zip(users, (u"First.", u"Second.")):
+            page = mission.next_page_for_user(user)
+            page.create_revision(text, user)
+            self.assertEqual(text, page.text)
+
+        page = Page.objects.select_related('latest_revision').get(
+            pk=pages[0].pk,
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(u"Second.", page.text)
+
+    def test_delete_latest(self):
+        """Deleting the latest revision falls back to the one before"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(1, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        for user, text in zip(users, (u"First.", u"Second.")):
+            page = mission.next_page_for_user(user)
+            page.create_revision(text, user)
+        page.latest_revision.delete()
+
+        self.assertEqual(u"First.", Page.objects.get(pk=pages[0].pk).text)
+
+    def test_save_revision(self):
+        """Revisions saved directly (not cleaned) update the text too"""
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(1, mission=mission)
+        users = UserFactory.create_batch(2)
+
+        Revision.objects.create(
+            page=pages[0],
+            text=u"From the admin.",
+            by=users[0],
+        )
+        self.assertEqual(
+            u"From the admin.",
+            Page.objects.get(pk=pages[0].pk).text,
+        )
+
+        revision = Revision.objects.create(
+            page=pages[0],
+            text=u"From a script.",
+            by=users[1],
+        )
+        self.assertEqual(
+            u"From a script.",
+            Page.objects.get(pk=pages[0].pk).text,
+        )
+        revision.delete()
+        self.assertEqual(
+            u"From the admin.",
+            Page.objects.get(pk=pages[0].pk).text,
+        )
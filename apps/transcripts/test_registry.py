@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+import os.path
+
+from .factories import *
+from .models import invalidate_missions_after_request, Mission, missions
+
+
+@override_settings(
+    MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+)
+class MissionRegistry(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.mission = MissionFactory(short_name='MA7', active=False)
+        self.other = MissionFactory(short_name='MA8')
+
+    def test_lookup(self):
+        """Once loaded, missions are found without a query."""
+        Mission.objects.load_registry()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.mission,
+                Mission.objects.get_by_short_name('MA7'),
+            )
+            self.assertEqual(self.other, Mission.objects.current())
+            with self.assertRaises(Mission.DoesNotExist):
+                Mission.objects.get_by_short_name('MA9')
+
+    def test_saved(self):
+        """Saving a mission reloads them."""
+        Mission.objects.load_registry()
+        self.other.active = False
+        self.other.save()
+        with self.assertRaises(IndexError):
+            Mission.objects.current()
+        self.mission.delete()
+        with self.assertRaises(Mission.DoesNotExist):
+            Mission.objects.get_by_short_name('MA7')
+
+    def test_other_process(self):
+        """Another process changing the version stamp reloads them."""
+        Mission.objects.load_registry()
+        # as if saved elsewhere: the database and version change, but
+        # not our registry
+        Mission.objects.filter(pk=self.mission.pk).update(name=u"Friendship 7")
+        self.assertNotEqual(
+            u"Friendship 7",
+            Mission.objects.get_by_short_name('MA7').name,
+        )
+        cache.set(missions.VERSION_KEY, 'elsewhere', None)
+        self.assertEqual(
+            u"Friendship 7",
+            Mission.objects.get_by_short_name('MA7').name,
+        )
+
+    def test_reloaded_before_commit(self):
+        """Another process reloading before a change commits catches up
+        once the request making it has finished."""
+        stale = missions.load()
+
+        # (in a transaction, as every TestCase is)
+        self.mission.name = u"Friendship 7"
+        self.mission.save()
+        # as if another process reloaded before the commit, seeing the
+        # old mission under the new stamp
+        missions._state = (cache.get(missions.VERSION_KEY),) + stale[1:]
+        self.assertNotEqual(
+            u"Friendship 7",
+            Mission.objects.get_by_short_name('MA7').name,
+        )
+
+        # (sending request_finished would also close the connection)
+        invalidate_missions_after_request(sender=self.__class__)
+        self.assertEqual(
+            u"Friendship 7",
+            Mission.objects.get_by_short_name('MA7').name,
+        )
+
+    def test_lazy(self):
+        """Missions are loaded on the first lookup, not at startup."""
+        missions._state = None
+        with self.assertNumQueries(0):
+            import kallisto.wsgi
+            reload(kallisto.wsgi)
+        self.assertEqual(self.other, Mission.objects.current())
@@ -0,0 +1,84 @@
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django_webtest import WebTest
+from StringIO import StringIO
+
+from .factories import *
+from .models import Page
+from .testing import ThrowawayMediaMixin
+from lib.media import protected_storage
+
+
+class Tiles(ThrowawayMediaMixin, WebTest):
+    """Test deep zoom tiles for page images."""
+
+    def test_make_tiles(self):
+        """Pages with the same image share one set of tiles."""
+
+        mission = MissionFactory()
+        pages = PageFactory.create_batch(2, mission=mission)
+        call_command('make_tiles', processes=1, stdout=StringIO())
+
+        keys = set(Page.objects.values_list('tiles', flat=True))
+        self.assertEqual(1, len(keys))
+        key = keys.pop()
+        descriptor = protected_storage.open("tiles/%s/page.dzi" % key).read()
+        self.assertIn('Width="2521" Height="3054"', descriptor)
+        # 2521x3054 goes up to level 12, which is 10 tiles by 13
+        self.assertEqual(
+            sorted(
+                "%i_%i.jpg" % (column, row)
+                for column in range(10)
+                for row in range(13)
+            ),
+            sorted(protected_storage.listdir("tiles/%s/page_files/12" % key)[1]),
+        )
+        self.assertEqual(
+            [ "0_0.jpg" ],
+            protected_storage.listdir("tiles/%s/page_files/0" % key)[1],
+        )
+
+    def test_tiles_view(self):
+        """Tiles are served to people who are logged in, cached forever."""
+
+        page = PageFactory(mission=MissionFactory())
+        call_command('make_tiles', processes=1, stdout=StringIO())
+        page = Page.objects.get(pk=page.pk)
+        user = UserFactory()
+
+        resp = self.app.get(
+            reverse(
+                "mission-page",
+                kwargs={
+                    'slug': page.mission.short_name,
+                    'page': page.number,
+                }
+            ),
+            user=user.email,
+        )
+        self.assertEqual(
+            page.tiles_url(),
+            resp.html.find(id='original')['data-tiles'],
+        )
+
+        resp = self.app.get(page.tiles_url(), user=user.email)
+        self.assertEqual('application/xml', resp.content_type)
+        self.assertIn('immutable', resp.headers['Cache-Control'])
+        tile_url = reverse(
+            "page-tiles",
+            kwargs={ 'key': page.tiles, 'path': 'page_files/12/3_4.jpg' },
+        )
+        resp = self.app.get(tile_url, user=user.email)
+        self.assertEqual('image/jpeg', resp.content_type)
+
+        self.app.reset()
+        resp = self.app.get(tile_url)
+        self.assertEqual(302, resp.status_int)
+        resp = self.app.get(
+            reverse(
+                "page-tiles",
+                kwargs={ 'key': '0' * 40, 'path': 'page.dzi' },
+            ),
+            user=user.email,
+            status=404,
+        )
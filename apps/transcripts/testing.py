@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.test.utils import override_settings
+import os.path
+import shutil
+import tempfile
+
+
+class ThrowawayMediaMixin(object):
+    """
+    Run each test against a copy of the test media in a temporary
+    MEDIA_ROOT, for tests that write files (imported images, exports,
+    tiles) under it.
+    """
+
+    def setUp(self):
+        super(ThrowawayMediaMixin, self).setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        shutil.rmtree(media_root)
+        shutil.copytree(
+            os.path.join(settings.BASE_DIR, 'apps/transcripts/test_media'),
+            media_root,
+        )
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
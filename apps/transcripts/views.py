@@ -1,19 +1,43 @@
-from zipfile import ZipFile
-from StringIO import StringIO
 from django import forms
 from django.contrib.auth.decorators import login_required
 from django.core.urlresolvers import reverse
 from django.db import transaction
-from django.http import Http404, HttpResponse, HttpResponseRedirect
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+)
 from django.utils.translation import ugettext_lazy as _
-from django.views.generic import DetailView, UpdateView
-from .models import Mission, Page, Revision, LockExpired, MissionExporter
+from django.views.generic import DetailView, UpdateView, View
+from lib.common.middleware import query_budget
+from lib.media import protected_storage
+from .models import (
+    ActivityBucket,
+    ExportJob,
+    LockExpired,
+    Mission,
+    MissionExporter,
+    Page,
+    Revision,
+)
 
 
-class CleanNext(DetailView):
+class MissionMixin(object):
+    """Look up the mission from the slug in the URL (usually without a
+    query; see MissionRegistry)."""
     model = Mission
-    slug_field = 'short_name'
-    
+
+    def get_object(self, queryset=None):
+        try:
+            return Mission.objects.get_by_short_name(self.kwargs.get('slug'))
+        except Mission.DoesNotExist:
+            raise Http404
+
+
+class CleanNext(MissionMixin, DetailView):
+
     def get(self, request, *args, **kwargs):
         mission = self.get_object()
         page = mission.next_page_for_user(request.user)
@@ -29,10 +53,34 @@ class CleanNext(DetailView):
                     }
                 )
             )
-clean = login_required(CleanNext.as_view())
+clean = query_budget(10)(login_required(CleanNext.as_view()))
+
+
+class MissionPageMixin(object):
+    """Look up a page from the mission slug and page number in the URL."""
+
+    def get_object(self, queryset=None):
+        try:
+            mission = Mission.objects.get_by_short_name(self.kwargs.get('slug'))
+        except Mission.DoesNotExist:
+            raise Http404
+
+        try:
+            page = mission.pages.select_related(
+                'latest_revision',
+            ).get(
+                number=int(self.kwargs.get('page')),
+            )
+        except Page.DoesNotExist:
+            raise Http404
+        except ValueError:
+            # could not convert number URL kwarg to int
+            raise Http404
+
+        return page
 
 
-class CleanPage(UpdateView):
+class CleanPage(MissionPageMixin, UpdateView):
     model = Page
     template_name_suffix = '_clean'
 
@@ -73,22 +121,6 @@ class CleanPage(UpdateView):
     def get_context_data(self, **kwargs):
         return super(CleanPage, self).get_context_data(**kwargs)
     
-    def get_object(self, queryset=None):
-        try:
-            mission = Mission.objects.get(short_name=self.kwargs.get('slug'))
-        except Mission.DoesNotExist:
-            raise Http404
-
-        try:
-            page = mission.pages.get(number=int(self.kwargs.get('page')))
-        except Page.DoesNotExist:
-            raise Http404
-        except ValueError:
-            # could not convert number URL kwarg to int
-            raise Http404
-
-        return page
-
     def form_valid(self, form):
         try:
             form.save()
@@ -106,45 +138,167 @@ class CleanPage(UpdateView):
             return self.form_invalid(form)
     
     def get_success_url(self):
+        # Go straight on to the next page of the user's lease, if they
+        # have one, rather than claiming again.
+        mission = self.object.mission
+        next_page = mission.leased_pages(self.request.user).first()
+        if next_page is not None:
+            return reverse(
+                'mission-page',
+                kwargs={
+                    'slug': mission.short_name,
+                    'page': next_page.number,
+                },
+            )
         return reverse(
             'mission-clean-next',
             kwargs={
-                'slug': self.object.mission.short_name,
+                'slug': mission.short_name,
             },
         )
-page = login_required(CleanPage.as_view())
+page = query_budget(25)(login_required(CleanPage.as_view()))
 
 
-class ExportMission(DetailView):
-    model = Mission
-    slug_field = 'short_name'
+class RenewLock(MissionPageMixin, View):
+    """
+    Keep hold of a page while still working on it. Called periodically
+    by the cleaning page; 409 if the lock has already been lost.
+    """
 
-    def get(self, request, *args, **kwargs):
-        response = HttpResponse(self._zip_data().read())
-        response['Content-Disposition'] = 'attachment; filename=%s.zip' % (self._mission_short_name,)
-        response['Content-Type'] = 'application/x-zip'
+    def post(self, request, *args, **kwargs):
+        page = self.get_object()
+        if not page.renew_lock(request.user):
+            return JsonResponse(
+                {
+                    'error': unicode(_(u"Lock lost.")),
+                },
+                status=409,
+            )
+        return HttpResponse(status=204)
+renew = query_budget(10)(login_required(RenewLock.as_view()))
+
+
+class PageTiles(View):
+    """
+    Serve a page's deep zoom descriptor and tiles to people who are
+    logged in. They're named for the image they were cut from, so can be
+    cached forever.
+    """
+
+    def get(self, request, key, path):
+        name = "tiles/%s/%s" % (key, path)
+        try:
+            f = protected_storage.open(name)
+        except (IOError, OSError):
+            raise Http404
+        response = FileResponse(
+            f,
+            content_type=(
+                'application/xml' if path.endswith('.dzi') else 'image/jpeg'
+            ),
+        )
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
         return response
+tiles = query_budget(5)(login_required(PageTiles.as_view()))
+
+
+class MissionLeaderboard(MissionMixin, DetailView):
+    template_name = 'transcripts/leaderboard.html'
+
+    def get_context_data(self, **kwargs):
+        kwargs['leaderboard'] = self.object.leaderboard()
+        return super(MissionLeaderboard, self).get_context_data(**kwargs)
+
+leaderboard = query_budget(5)(MissionLeaderboard.as_view())
+
+
+class MissionStats(MissionMixin, DetailView):
+    template_name = 'transcripts/stats.html'
+
+    def get_context_data(self, **kwargs):
+        kwargs['pages'] = self.object.pages.count()
+        kwargs['pages_approved'] = self.object.approved_pages().count()
+        kwargs['eta'] = self.object.eta(
+            kwargs['pages'] - kwargs['pages_approved'],
+        )
+        # newest first
+        kwargs['hours'] = self.object.activity.filter(
+            period=ActivityBucket.HOUR,
+        ).order_by('-start')[:24]
+        kwargs['days'] = self.object.activity.filter(
+            period=ActivityBucket.DAY,
+        ).order_by('-start')[:30]
+        return super(MissionStats, self).get_context_data(**kwargs)
 
-    def _zip_data(self):
-        exporter = self._get_exporter()
-        zip_data = StringIO()
-        with ZipFile(zip_data, mode='w') as zip_file:
-            zip_file.writestr(
-                "%s/%s" % (self._mission_short_name, exporter.main_transcript_path()),
-                unicode(exporter.main_transcript()).encode("utf-8"),
+stats = query_budget(10)(MissionStats.as_view())
+
+
+class ExportMission(MissionMixin, DetailView):
+
+    def get(self, request, *args, **kwargs):
+        # Served straight from storage if nobody has cleaned a page
+        # since the last export; otherwise queued for export_worker, so
+        # a big mission doesn't tie up a web worker.
+        self.object = self.get_object()
+        exporter = MissionExporter(self.object)
+        watermark = exporter.watermark()
+        archive = exporter.cached_zip(generate=False, watermark=watermark)
+        if archive is not None:
+            return _zip_response(self.object, archive)
+        job = ExportJob.objects.enqueue(self.object, request.user, watermark)
+        return HttpResponseRedirect(
+            reverse(
+                'mission-export-job',
+                kwargs={
+                    'slug': self.object.short_name,
+                    'job': job.pk,
+                }
             )
-            zip_file.writestr(
-                "%s/%s" % (self._mission_short_name, exporter.meta_path()),
-                unicode(exporter.meta()).encode("utf-8"),
+        )
+
+export = login_required(ExportMission.as_view())
+
+
+class ExportJobStatus(DetailView):
+    model = ExportJob
+    pk_url_kwarg = 'job'
+    context_object_name = 'job'
+    template_name = 'transcripts/export_job.html'
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(
+            mission__short_name=self.kwargs['slug'],
+        ).select_related('mission')
+
+export_job = query_budget(5)(login_required(ExportJobStatus.as_view()))
+
+
+class DownloadExport(ExportJobStatus):
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if (
+            self.object.status != ExportJob.DONE or
+            not protected_storage.exists(self.object.archive)
+        ):
+            # not ready, or superseded by a newer export
+            return HttpResponseRedirect(
+                reverse(
+                    'mission-export',
+                    kwargs={ 'slug': self.object.mission.short_name },
+                )
             )
-        zip_data.seek(0)
-        return zip_data
+        return _zip_response(self.object.mission, self.object.archive)
 
-    def _get_exporter(self):
-        return MissionExporter(self.get_object())
+export_download = login_required(DownloadExport.as_view())
 
-    @property
-    def _mission_short_name(self):
-        return self.get_object().short_name
 
-export = login_required(ExportMission.as_view())
+def _zip_response(mission, archive):
+    response = FileResponse(
+        protected_storage.open(archive),
+        content_type='application/x-zip',
+    )
+    response['Content-Disposition'] = 'attachment; filename=%s.zip' % (
+        mission.short_name,
+    )
+    return response
@@ -38,6 +38,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'lib.common.middleware.QueryCountMiddleware',
 #    'djangosecure.middleware.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,6 +108,26 @@ DEFAULT_TO_EMAIL = [ 'kallisto-errors@spacelog.org' ]
 SERVER_EMAIL = 'kallisto-errors@spacelog.org'
 
 
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'kallisto': {
+            'handlers': ['console'],
+            # per-request query stats are INFO; too noisy for tests
+            'level': 'WARNING' if 'test' in sys.argv else 'INFO',
+        },
+    },
+}
+
+
 # Database
 
 DATABASES = {
@@ -122,6 +143,34 @@ database = dj_database_url.config()
 if database:
     DATABASES['default'] = database
 
+# Caching
+#
+# Local memory by default; set CACHE_DIR to share a file-based cache
+# between processes (eg gunicorn workers).
+
+CACHE_DIR = os.environ.get('CACHE_DIR')
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# The homepage is invalidated when pages are cleaned or missions
+# change; this is in case we miss something.
+HOMEPAGE_CACHE_SECONDS = 60
+
+# Views can declare how many queries they should make (see
+# lib.common.middleware.query_budget); going over fails the tests.
+QUERY_BUDGETS_STRICT = 'test' in sys.argv
+
 # Templates
 
 TEMPLATE_DIRS = (
@@ -149,3 +198,10 @@ AUTH_USER_MODEL = 'people.User'
 LOGIN_REDIRECT_URL = 'homepage'
 LOGIN_URL = 'login'
 LOGOUT_URL = 'logout'
+
+
+# Cleaning
+
+# How many pages a cleaner claims at once. With more than one, they move
+# from page to page of their lease without claiming each separately.
+PAGE_LEASE_SIZE = int(os.environ.get('PAGE_LEASE_SIZE', '1'))
@@ -9,9 +9,15 @@ urlpatterns = patterns(
     url(r'^$', 'apps.homepage.views.homepage', name='homepage'),
     url(r'^help$', 'apps.homepage.views.help', name='help'),
     url(r'^admin/', include(admin.site.urls)),
+    url(r'^tiles/(?P<key>[0-9a-f]{40})/(?P<path>page\.dzi|page_files/[0-9]+/[0-9]+_[0-9]+\.jpg)$', 'apps.transcripts.views.tiles', name='page-tiles'),
     url(r'^(?P<slug>[0-9A-Za-z]+)/$', 'apps.transcripts.views.clean', name='mission-clean-next'),
     url(r'^(?P<slug>[0-9A-Za-z]+)/(?P<page>[0-9]+)/$', 'apps.transcripts.views.page', name='mission-page'),
+    url(r'^(?P<slug>[0-9A-Za-z]+)/(?P<page>[0-9]+)/renew/$', 'apps.transcripts.views.renew', name='mission-page-renew'),
+    url(r'^(?P<slug>[0-9A-Za-z]+)/leaderboard/$', 'apps.transcripts.views.leaderboard', name='mission-leaderboard'),
+    url(r'^(?P<slug>[0-9A-Za-z]+)/stats/$', 'apps.transcripts.views.stats', name='mission-stats'),
     url(r'^(?P<slug>[0-9A-Za-z]+)/export/$', 'apps.transcripts.views.export', name='mission-export'),
+    url(r'^(?P<slug>[0-9A-Za-z]+)/export/(?P<job>[0-9]+)/$', 'apps.transcripts.views.export_job', name='mission-export-job'),
+    url(r'^(?P<slug>[0-9A-Za-z]+)/export/(?P<job>[0-9]+)/download/$', 'apps.transcripts.views.export_download', name='mission-export-download'),
 
     url(r'^account/register/$', 'apps.people.views.register', name='register'),
     url(r'^account/registered/$', 'apps.people.views.registered', name='registered'),
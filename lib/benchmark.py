@@ -0,0 +1,16 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+
+# For the help of benchmarks that run people in threads.
+THREADS_CAVEAT = """Threads share the GIL, so treat the results as a guide to database
+behaviour under concurrency rather than to raw web throughput."""
+
+
+def percentile(values, n):
+    """Returns the nth percentile (0-100) of values, or 0 if empty."""
+    if len(values) == 0:
+        return 0
+    values = sorted(values)
+    index = int(round(n / 100.0 * (len(values) - 1)))
+    return values[index]
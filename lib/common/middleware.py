@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.db import connections, reset_queries
+import logging
+
+
+logger = logging.getLogger('kallisto.queries')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(n):
+    """
+    Allow the decorated view at most n database queries per request.
+
+    Checked by QueryCountMiddleware. (Apply it outside login_required
+    and friends so it can be seen.)
+    """
+    def decorator(view):
+        view.query_budget = n
+        return view
+    return decorator
+
+
+class QueryCountMiddleware(object):
+    """
+    Count each request's database queries and how long they took.
+
+    In DEBUG, this is reported in X-DB-* response headers; otherwise
+    it's logged to kallisto.queries. Views with a query_budget() that
+    make too many queries (from the view onwards) raise
+    QueryBudgetExceeded if QUERY_BUDGETS_STRICT is set (as it is when
+    testing), and log a warning if not.
+
+    Put this first in MIDDLEWARE_CLASSES so it sees every query.
+    """
+
+    def process_request(self, request):
+        request._query_count_forced = []
+        for connection in connections.all():
+            if not connection.force_debug_cursor:
+                connection.force_debug_cursor = True
+                request._query_count_forced.append(connection)
+        reset_queries()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+        # budgets are for the view, not for session & auth middleware
+        request._query_view_start = sum(
+            len(connection.queries_log) for connection in connections.all()
+        )
+        request._query_view = getattr(
+            view_func,
+            '__name__',
+            view_func.__class__.__name__,
+        )
+
+    def process_response(self, request, response):
+        if not hasattr(request, '_query_count_forced'):
+            # another middleware short-circuited before us
+            return response
+
+        queries = []
+        for connection in connections.all():
+            queries.extend(connection.queries)
+        for connection in request._query_count_forced:
+            connection.force_debug_cursor = False
+        del request._query_count_forced
+
+        count = len(queries)
+        total = sum(float(query['time']) for query in queries)
+        if count > 0:
+            slowest = max(queries, key=lambda query: float(query['time']))
+            slowest_time = float(slowest['time'])
+            slowest_sql = u" ".join(slowest['sql'].split())
+        else:
+            slowest_time = 0
+            slowest_sql = u""
+        view = getattr(request, '_query_view', None)
+
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(count)
+            response['X-DB-Time'] = "%.1fms" % (total * 1000)
+            response['X-DB-Slowest'] = (
+                u"%.1fms %s" % (slowest_time * 1000, slowest_sql[:200])
+            ).encode('ascii', 'replace')
+        else:
+            logger.info(
+                u"path=%s view=%s status=%i queries=%i db_ms=%.1f "
+                u"slowest_ms=%.1f slowest=%r",
+                request.path,
+                view,
+                response.status_code,
+                count,
+                total * 1000,
+                slowest_time * 1000,
+                slowest_sql[:500],
+            )
+
+        budget = getattr(request, '_query_budget', None)
+        view_count = count - getattr(request, '_query_view_start', 0)
+        if budget is not None and view_count > budget:
+            message = u"%s made %i queries (budget %i)." % (
+                view,
+                view_count,
+                budget,
+            )
+            if getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        return response
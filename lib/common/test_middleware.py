@@ -0,0 +1,71 @@
+from django.conf.urls import include, patterns, url
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test.utils import override_settings
+from django_webtest import WebTest
+
+from apps.people.models import User
+from . import middleware
+from .middleware import query_budget, QueryBudgetExceeded
+
+
+@query_budget(1)
+def two_queries(request):
+    User.objects.count()
+    User.objects.count()
+    return HttpResponse("")
+
+
+class Logger(object):
+    """Stands in for a logger, remembering warnings."""
+
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, message, *args):
+        pass
+
+    def warning(self, message, *args):
+        self.warnings.append(message % args)
+
+
+urlpatterns = patterns(
+    '',
+    url(r'^two/$', two_queries),
+    url(r'^', include('kallisto.urls')),
+)
+
+
+@override_settings(ROOT_URLCONF='lib.common.test_middleware')
+class QueryCount(WebTest):
+
+    def setUp(self):
+        # so the homepage has to query something
+        cache.clear()
+
+    @override_settings(DEBUG=True)
+    def test_headers(self):
+        """In debug, query stats come back as response headers."""
+        resp = self.app.get('/')
+        self.assertTrue(int(resp.headers['X-DB-Queries']) > 0)
+        self.assertTrue(resp.headers['X-DB-Time'].endswith('ms'))
+        self.assertIn('SELECT', resp.headers['X-DB-Slowest'])
+
+    def test_budget(self):
+        """Going over a view's query budget fails loudly in tests."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.app.get('/two/')
+
+    @override_settings(QUERY_BUDGETS_STRICT=False)
+    def test_budget_not_strict(self):
+        """Outside tests, going over budget only logs a warning."""
+        logger = Logger()
+        self.addCleanup(setattr, middleware, 'logger', middleware.logger)
+        middleware.logger = logger
+
+        resp = self.app.get('/two/')
+        self.assertEqual(200, resp.status_int)
+        self.assertEqual(
+            [ u"two_queries made 2 queries (budget 1)." ],
+            logger.warnings,
+        )
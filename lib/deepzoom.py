@@ -0,0 +1,66 @@
+"""
+Cut images into Deep Zoom (DZI) tile pyramids, so a viewer such as
+OpenSeadragon only needs to fetch the tiles in view at the current zoom.
+
+A pyramid for an image called NAME is a NAME.dzi descriptor plus
+NAME_files/<level>/<column>_<row>.jpg tiles; level 0 is a single pixel
+and the top level is the image at full size.
+"""
+
+from io import BytesIO
+from PIL import Image
+import math
+
+
+TILE_SIZE = 254
+OVERLAP = 1
+FORMAT = 'jpg'
+
+
+def descriptor(size, tile_size=TILE_SIZE, overlap=OVERLAP):
+    """Returns the .dzi XML for an image of size (width, height)."""
+    return (
+        u'<?xml version="1.0" encoding="UTF-8"?>\n'
+        u'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+        u'Format="%s" Overlap="%i" TileSize="%i">'
+        u'<Size Width="%i" Height="%i"/></Image>\n'
+    ) % (FORMAT, overlap, tile_size, size[0], size[1])
+
+
+def tiles(image, tile_size=TILE_SIZE, overlap=OVERLAP, quality=80):
+    """
+    Yield (path, JPEG bytes) for each tile of a PIL image, with paths
+    relative to the NAME_files directory. Each level is scaled down from
+    the one above, so the full-size image is only resampled once.
+    """
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('L' if image.mode in ('1', 'LA') else 'RGB')
+    width, height = image.size
+    max_level = int(math.ceil(math.log(max(width, height), 2)))
+
+    for level in range(max_level, -1, -1):
+        scale = 2 ** (max_level - level)
+        level_size = (
+            max(1, int(math.ceil(width / float(scale)))),
+            max(1, int(math.ceil(height / float(scale)))),
+        )
+        if image.size != level_size:
+            image = image.resize(level_size, Image.ANTIALIAS)
+        columns = int(math.ceil(level_size[0] / float(tile_size)))
+        rows = int(math.ceil(level_size[1] / float(tile_size)))
+        for column in range(columns):
+            for row in range(rows):
+                left = column * tile_size - (overlap if column > 0 else 0)
+                top = row * tile_size - (overlap if row > 0 else 0)
+                right = min((column + 1) * tile_size + overlap, level_size[0])
+                bottom = min((row + 1) * tile_size + overlap, level_size[1])
+                out = BytesIO()
+                image.crop((left, top, right, bottom)).save(
+                    out,
+                    'JPEG',
+                    quality=quality,
+                )
+                yield (
+                    "%i/%i_%i.%s" % (level, column, row, FORMAT),
+                    out.getvalue(),
+                )
@@ -1,22 +1,45 @@
 from django.conf import settings
+from django.core.signals import setting_changed
 from django.db import models
+from django.dispatch import receiver
+from django.core.files.base import ContentFile
+from django.utils.functional import empty, LazyObject
+from io import BytesIO
+from PIL import Image
 import os.path
 import time
 
 
-if hasattr(settings, 'AWS_STORAGE_BUCKET_NAME'):
-    import storages.backends.s3boto
-    protected_storage = storages.backends.s3boto.S3BotoStorage(
-        acl='private',
-        querystring_auth=True,
-        querystring_expire=600, # 10 minutes, try to ensure people won't/can't share
-    )
-else:
-    from django.core.files.storage import FileSystemStorage
-    protected_storage = FileSystemStorage(
-        location=os.path.join(settings.MEDIA_ROOT, 'protected'),
-        base_url='%s%s/' % (settings.MEDIA_URL, 'protected'),
-    )
+class ProtectedStorage(LazyObject):
+    """
+    Storage for files only logged-in people should see: private S3 with
+    short-lived signed URLs if configured, otherwise MEDIA_ROOT/protected.
+
+    Set up on first use (like Django's default_storage), so it follows
+    changes to MEDIA_ROOT in tests.
+    """
+
+    def _setup(self):
+        if hasattr(settings, 'AWS_STORAGE_BUCKET_NAME'):
+            import storages.backends.s3boto
+            self._wrapped = storages.backends.s3boto.S3BotoStorage(
+                acl='private',
+                querystring_auth=True,
+                querystring_expire=600, # 10 minutes, try to ensure people won't/can't share
+            )
+        else:
+            from django.core.files.storage import FileSystemStorage
+            self._wrapped = FileSystemStorage(
+                location=os.path.join(settings.MEDIA_ROOT, 'protected'),
+                base_url='%s%s/' % (settings.MEDIA_URL, 'protected'),
+            )
+protected_storage = ProtectedStorage()
+
+
+@receiver(setting_changed)
+def reset_protected_storage(setting, **kwargs):
+    if setting in ('MEDIA_ROOT', 'MEDIA_URL'):
+        protected_storage._wrapped = empty
 
 
 def core_media_filename(type, instance_unique, filename):
@@ -41,6 +64,52 @@ def slugged_media_filename(type, instance, filename):
     return core_media_filename(type, instance.slug, filename)
 
 
+def jpeg_rendition(f, max_width, quality=80):
+    """
+    Returns a JPEG version of the image in f, scaled down to no wider
+    than max_width, as (ContentFile, (width, height)).
+    """
+    image = Image.open(f)
+    if image.mode not in ('L', 'RGB'):
+        # greyscale scans stay greyscale
+        image = image.convert('L' if image.mode in ('1', 'LA') else 'RGB')
+    width, height = image.size
+    if width > max_width:
+        image = image.resize(
+            (max_width, int(round(height * max_width / float(width)))),
+            Image.ANTIALIAS,
+        )
+    out = BytesIO()
+    image.save(
+        out,
+        'JPEG',
+        quality=quality,
+        optimize=True,
+        progressive=True,
+    )
+    return ContentFile(out.getvalue()), image.size
+
+
+def delete_directory(storage, path):
+    """
+    Delete everything under path in storage, and the directory itself
+    where storage has them (S3 only has names).
+    """
+    try:
+        directories, files = storage.listdir(path)
+    except OSError:
+        # already gone
+        return
+    for name in files:
+        storage.delete("%s/%s" % (path, name))
+    for name in directories:
+        delete_directory(storage, "%s/%s" % (path, name))
+    try:
+        os.rmdir(storage.path(path))
+    except NotImplementedError:
+        pass
+
+
 class MigratableFileFieldMixin(object):
     """
     Django 1.7 FieldField isn't serialisable with a lambda as upload_to.
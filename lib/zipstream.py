@@ -0,0 +1,133 @@
+"""
+Write ZIP archives as a stream of byte strings, without seeking or
+holding whole entries in memory (which zipfile.ZipFile needs to do).
+"""
+
+import struct
+import time
+import zlib
+
+
+# Entry sizes and CRC follow the data (in a "data descriptor"), and
+# names are UTF-8.
+FLAGS = 0x08 | 0x800
+DEFLATED = 8
+VERSION = 20
+
+
+class ZipStream(object):
+    """
+    Build a ZIP archive incrementally:
+
+        zip_stream = ZipStream()
+        for data in zip_stream.entry('a.txt', chunks_of_a):
+            send(data)
+        ...
+        for data in zip_stream.close():
+            send(data)
+
+    Only the central directory is kept in memory. There's no ZIP64
+    support, so entries and the archive must stay under 4GB.
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._entries = []
+
+    def entry(self, name, chunks, date_time=None):
+        """Yield the bytes of a deflated entry made from chunks (of bytes)."""
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        if date_time is None:
+            date_time = time.localtime(time.time())[:6]
+        dos_time = (date_time[3] << 11) | (date_time[4] << 5) | (date_time[5] // 2)
+        dos_date = ((date_time[0] - 1980) << 9) | (date_time[1] << 5) | date_time[2]
+
+        offset = self._offset
+        yield self._emit(
+            struct.pack(
+                '<4s5H3L2H',
+                b'PK\x03\x04',
+                VERSION,
+                FLAGS,
+                DEFLATED,
+                dos_time,
+                dos_date,
+                0, # CRC and sizes are in the data descriptor
+                0,
+                0,
+                len(name),
+                0,
+            ) + name
+        )
+
+        crc = 0
+        size = 0
+        compressed_size = 0
+        compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION,
+            zlib.DEFLATED,
+            -15,
+        )
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                compressed_size += len(compressed)
+                yield self._emit(compressed)
+        compressed = compressor.flush()
+        compressed_size += len(compressed)
+        yield self._emit(compressed)
+
+        crc &= 0xffffffff
+        yield self._emit(
+            struct.pack('<4s3L', b'PK\x07\x08', crc, compressed_size, size)
+        )
+        self._entries.append(
+            (name, dos_time, dos_date, crc, compressed_size, size, offset)
+        )
+
+    def close(self):
+        """Yield the central directory, which ends the archive."""
+        start = self._offset
+        for name, dos_time, dos_date, crc, compressed_size, size, offset in self._entries:
+            yield self._emit(
+                struct.pack(
+                    '<4s6H3L5H2L',
+                    b'PK\x01\x02',
+                    VERSION,
+                    VERSION,
+                    FLAGS,
+                    DEFLATED,
+                    dos_time,
+                    dos_date,
+                    crc,
+                    compressed_size,
+                    size,
+                    len(name),
+                    0,
+                    0,
+                    0,
+                    0,
+                    0o644 << 16, # -rw-r--r--
+                    offset,
+                ) + name
+            )
+        yield self._emit(
+            struct.pack(
+                '<4s4H2LH',
+                b'PK\x05\x06',
+                0,
+                0,
+                len(self._entries),
+                len(self._entries),
+                self._offset - start,
+                start,
+                0,
+            )
+        )
+
+    def _emit(self, data):
+        self._offset += len(data)
+        return data
@@ -2,4 +2,46 @@ $(function() {
     $('header p.user').click(function() {
         $('header ul.user-options').toggle(); 
     });
+
+    // Keep hold of the page we're cleaning, as long as we're actually
+    // working on it.
+    var clean = $('form#clean[data-renew-url]');
+    if (clean.length) {
+        var active = false;
+        clean.find('textarea').on('input', function() {
+            active = true;
+        });
+        var renewer = setInterval(function() {
+            if (!active) {
+                return;
+            }
+            active = false;
+            $.ajax({
+                type: 'POST',
+                url: clean.data('renew-url'),
+                headers: {
+                    'X-CSRFToken': clean.find('input[name=csrfmiddlewaretoken]').val()
+                }
+            }).fail(function(xhr) {
+                if (xhr.status == 409) {
+                    clearInterval(renewer);
+                    $('<p class="warning">').text(
+                        clean.data('lock-lost')
+                    ).insertBefore(clean);
+                }
+            });
+        }, clean.data('renew-every') * 1000);
+    }
+
+    // Zoom in on the page scan, fetching only the tiles in view.
+    var original = $('#original[data-tiles]');
+    if (original.length && window.OpenSeadragon) {
+        original.empty().addClass('deep-zoom');
+        OpenSeadragon({
+            element: original[0],
+            prefixUrl: original.data('zoom-images'),
+            tileSources: original.data('tiles'),
+            showNavigator: true
+        });
+    }
 });